@@ -5,21 +5,34 @@ import textwrap
 import shutil
 import argparse
 import os
+import posixpath
 import sys
-from time import sleep
+from time import sleep, time
 from xml.etree import ElementTree
 import logging
-from urllib.parse import urlencode, quote
+from urllib.parse import urlencode, quote, unquote, urlparse, parse_qs
 from datetime import datetime
 import contextlib
+import copy
+import glob
+import html
+import json
+import multiprocessing
+import re
+import threading
+from collections import deque, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 
 import math
+import mimetypes
+import struct
+from array import array
 
+import numpy as np
 import pandas as pd 
-import pandas.io.formats.excel
 import xlsxwriter
 
-import matplotlib.pyplot as plt
 starttime = datetime.now()
 ######### Begin Classes #########
 
@@ -28,17 +41,20 @@ class config:
         self.LOGLEVEL                = os.environ.get('LOGLEVEL', 'INFO').upper()
         self.bgg                     = 'https://boardgamegeek.com/xmlapi2'
         self.successful_responses    = 0
-        self.dict_player_count       = {}
-        self.dict_category           = {}
+        self.dict_index              = {section: {} for section in index_titles}
+        self.dict_index_games        = {}
         self.dict_game_info           = {}
         self.dict_plays_info           = {}
 
         self.user_name               = args.username
         self.card_mode               = args.cardmode or False
         self.index                   = args.index    or False
+        self.index_sections          = [section for section in args.index_sections.split(',') if len(section) > 0]
+        self.index_json              = args.index_json
         self.only_own                = args.own      or False
         self.plays                   = args.plays    or False
         self.want_to_play            = args.want_to_play or False
+        self.expansions              = args.expansions or False
 
         self.template                = "./template.html"
         self.card_template           = "./template_card.html"
@@ -49,8 +65,25 @@ class config:
         self.output                  = args.output if len(args.output) > 0 else"./output.html"
         self.output_plays            = args.output_plays if len(args.output_plays) > 0 else"./output_plays.html"
         self.output_not_play         = args.output_not_play if len(args.output_not_play) > 0 else"./output_not_play.html"
+        self.output_expansions       = args.output_expansions if len(args.output_expansions) > 0 else"./output_expansions.html"
         self.output_xlsx             = args.output_xlsx if len(args.output_xlsx) > 0 else"./Plays.xlsx"
+        self.plays_export            = args.plays_export.split(',')
+        self.plays_sheets            = args.plays_sheets.split(',') if len(args.plays_sheets) > 0 else list(plays_sheet_titles)
+        self.export_in_background    = args.export_in_background or False
+        self.rollups_file            = args.rollups_file if len(args.rollups_file) > 0 else"./Plays_rollups.pkl"
+        self.journal                 = args.journal if len(args.journal) > 0 else"./download_journal.jsonl"
+        self.journal_plays           = None
+        self.chart_engine            = args.chart_engine
+        self.meeple_limit            = int(args.meeple_limit) if len(args.meeple_limit) > 0 else 10
+        self.recap                   = [window for window in args.recap.split(',') if len(window) > 0]
+        #Checked now rather than after the build. The windows are parsed again when written, last N months moving with the date in --serve mode.
+        try:
+            for window in self.recap:
+                parse_recap_window(window)
+        except ValueError as e:
+            sys.exit('--recap: ' + str(e))
         self.collection_xml          = args.collection_xml if len(args.collection_xml) > 0 else"./collection.xml"
+        self.expansions_xml          = os.path.splitext(self.collection_xml)[0] + "_expansions.xml"
         self.images_path             = args.images_path if len(args.images_path) > 0 else"./Images"
         self.xml_path                = args.xml_path if len(args.xml_path) > 0 else"./game_xml"
 
@@ -59,6 +92,23 @@ class config:
         self.no_cache                = args.no_cache or False
         self.no_cache_plays          = args.no_cache_plays or False
         self.web_mode                = os.path.exists("./app.py")
+        self.serve                   = args.serve or False
+        self.port                    = int(args.port) if len(args.port) > 0 else 8000
+        self.serve_path              = args.serve_path if len(args.serve_path) > 0 else"./users"
+        self.refresh                 = int(args.refresh) if len(args.refresh) > 0 else 3600
+        self.memory_cache            = memory_cache(int(args.cache_entries) if len(args.cache_entries) > 0 else 20000) if self.serve else None
+        self.cache_users             = int(args.cache_users) if len(args.cache_users) > 0 else 100
+        self.jobs                    = int(args.jobs) if len(args.jobs) > 0 else 1
+        #Forking a render process pool from the threads of the web service is not safe, the service renders in a thread.
+        if(self.serve and self.jobs != 1):
+            sys.exit('--jobs cannot be used with --serve')
+        self.pipeline                = args.pipeline or False
+        self.pipeline_window         = int(args.pipeline_window) if len(args.pipeline_window) > 0 else 64
+        self.shard_size              = int(args.shard_size) if len(args.shard_size) > 0 else 0
+        #The service answers one page per user, the shards linked from the table of contents could not be reached.
+        if(self.serve and self.shard_size > 0):
+            sys.exit('--shard_size cannot be used with --serve')
+        self.shard_outputs           = []
 
 class collection_information:
     def __init__(self, item, config):
@@ -100,6 +150,77 @@ class game_information:
         self.four_mechanics_length  = len((self.mechanic1 or "") + (self.mechanic2 or "") + (self.mechanic3 or "") + (self.mechanic4 or ""))
         self.description            = textwrap.shorten(get_prop_text(items, 'description') or "", width=get_description_length(config), placeholder='...')
         self.lastPlayed             = ""
+        self.output_page            = config.output
+
+class memory_cache:
+    #Least recently used entries are evicted past max_entries. Shared by the builds of the server mode.
+    def __init__(self, max_entries):
+        self.max_entries    = max_entries
+        self.entries        = OrderedDict()
+        self.lock           = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class plays_columns:
+    #Plays are appended straight into typed columns (one row per player per play) and turned into playsDF without any per-row list.
+    def __init__(self):
+        self.id_game        = array('q')
+        self.id_play        = array('q')
+        self.quantity       = array('q')
+        self.victory        = array('q')
+        self.date_codes     = array('q')
+        self.name_codes     = array('q')
+        self.player_codes   = array('q')
+        self.dates          = {}
+        self.names          = {}
+        self.players        = {}
+
+    def encode(self, categories, value):
+        code = categories.get(value)
+        if code is None:
+            code = categories[value] = len(categories)
+        return code
+
+    def append(self, id_game, name, id_play, date, quantity, player_name, victory):
+        self.id_game.append(id_game)
+        self.id_play.append(id_play)
+        self.quantity.append(quantity)
+        self.victory.append(victory)
+        self.date_codes.append(self.encode(self.dates, date))
+        self.name_codes.append(self.encode(self.names, name))
+        self.player_codes.append(self.encode(self.players, player_name))
+
+    def to_categorical(self, codes, categories):
+        #Categories are sorted so that the pivots keep the alphabetical order they had on plain strings.
+        order = sorted(categories)
+        remap = np.empty(len(order), dtype=np.int64)
+        remap[[categories[value] for value in order]] = np.arange(len(order))
+        return pd.Categorical.from_codes(remap[np.frombuffer(codes, dtype=np.int64)], categories=order)
+
+    def to_frame(self):
+        #Dates are parsed once per distinct day, then expanded through their codes.
+        dates = np.array(list(self.dates), dtype='datetime64[D]').astype('datetime64[ns]')
+        return pd.DataFrame({
+            'Id_Game'       : np.frombuffer(self.id_game, dtype=np.int64),
+            'Name'          : self.to_categorical(self.name_codes, self.names),
+            'Id_Play'       : np.frombuffer(self.id_play, dtype=np.int64),
+            'Date'          : dates[np.frombuffer(self.date_codes, dtype=np.int64)],
+            'Quantity'      : np.frombuffer(self.quantity, dtype=np.int64),
+            'Player_Name'   : self.to_categorical(self.player_codes, self.players),
+            'Victory'       : np.frombuffer(self.victory, dtype=np.int64),
+        })
 
 ######### End Classes #########
 
@@ -137,11 +258,22 @@ def bgg_getter (command, params, config):
                 config.sleep_time = max(10,config.sleep_time)
     return a
 
+def comma_separated_choices(choices):
+    #argparse type of a comma separated list, any unknown name is an error instead of being dropped.
+    def check(value):
+        unknown = [choice for choice in value.split(',') if len(choice) > 0 and choice not in choices]
+        if(unknown):
+            raise argparse.ArgumentTypeError('invalid choice: ' + ','.join(unknown) + ' (choose from ' + ','.join(choices) + ')')
+        return value
+    return check
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Create an html/pdf output of board game collection based on UserName from boardgamegeek.com.')
     parser.add_argument('-u','--username', dest='username', action='store', default='', help='User to pull BGG collection data from. (Required)')
     parser.add_argument('-c','--cardmode', dest='cardmode', action='store_true', help='Create cards instead of a catalog. (default=Off)')
     parser.add_argument('-i','--index', dest='index', action='store_true', help='Enables creating an index. (default=Off)')
+    parser.add_argument('--index_sections', dest='index_sections', action='store', default='players,category', type=comma_separated_choices(index_titles), help='Comma separated index sections written to the html among ' + ','.join(index_titles) + '. (Default="players,category")')
+    parser.add_argument('--index_json', dest='index_json', action='store', default='', help='Also write every index section to this JSON file, for client side filtering. (Default=Off)')
     parser.add_argument('-pl','--plays', dest='plays', action='store_true', help='Defining if the plays stored in BBG will be retrieved and proceed. (default=Off)')
     parser.add_argument('--clean_images', dest='clean_images', action='store_true', help='Clear out local images cache. (default=Off)')
     parser.add_argument('--clean_xml', dest='clean_xml', action='store_true', help='Clear out local xml cache. (default=Off)')
@@ -149,17 +281,37 @@ def parse_arguments():
     parser.add_argument('--clean_all', dest='clean_all', action='store_true', help='Clear out Images, XML, and all other generated files (default=Off)')
     parser.add_argument('-o','--own',dest='own', action='store_true', help='Enables pulling only games set to own on BGG. (default=Off)')
     parser.add_argument('-wtp','--want_to_play',dest='want_to_play', action='store_true', help='Enables pulling only games set to Want to play on BGG. (default=Off)')
+    parser.add_argument('-e','--expansions',dest='expansions', action='store_true', help='Also list the expansions of the collection, from the collection data only. (default=Off)')
     parser.add_argument('--minsleep', dest='minsleep', action='store', default='', help='Minimum sleep duration on XML error. (Default=10)')
     parser.add_argument('--maxsleep', dest='maxsleep', action='store', default='', help='Maximum sleep duration on XML error. (Default=120)')
     parser.add_argument('--output', dest='output', action='store', default='', help='Output html file. (Default="./output.html")')
     parser.add_argument('--output_plays', dest='output_plays', action='store', default='', help='Output html file for plays. (Default="./output_plays.html")')
     parser.add_argument('--output_not_play', dest='output_not_play', action='store', default='', help='Output html file for game not plays this year. (Default="./output_not_play.html")')
+    parser.add_argument('--output_expansions', dest='output_expansions', action='store', default='', help='Output html file for the expansions list. (Default="./output_expansions.html")')
     parser.add_argument('--output_xlsx', dest='output_xlsx', action='store', default='', help='Output Excel file for plays. (Default="./Plays.xlsx")')
+    parser.add_argument('--plays_export', dest='plays_export', action='store', default='xlsx', type=comma_separated_choices(plays_export_formats), help='Comma separated formats of the plays data among ' + ','.join(plays_export_formats) + '. Only xlsx is read back as plays cache. (Default="xlsx")')
+    parser.add_argument('--plays_sheets', dest='plays_sheets', action='store', default='', type=comma_separated_choices(plays_sheet_titles), help='Comma separated plays sheets to export among ' + ','.join(plays_sheet_titles) + '. main is always exported. (Default=all)')
+    parser.add_argument('--export_in_background', dest='export_in_background', action='store_true', help='Export the plays data while the plays html pages are rendered. (default=Off)')
+    parser.add_argument('--rollups_file', dest='rollups_file', action='store', default='', help='File storing the monthly plays rollups. (Default="./Plays_rollups.pkl")')
+    parser.add_argument('--recap', dest='recap', action='store', default='', help='Comma separated windows to write a plays recap page for: a year (2022), the last N months (last12) or a month range (2023-03:2023-08). (Default=None)')
+    parser.add_argument('--chart_engine', dest='chart_engine', action='store', choices=['svg', 'matplotlib'], default='svg', help='Victory pies are inline SVG, or PNG files drawn with matplotlib. (Default="svg")')
+    parser.add_argument('--meeple_limit', dest='meeple_limit', action='store', default='', help='Above this number of victories, a single meeple followed by the count is shown. (Default=10)')
+    parser.add_argument('--journal', dest='journal', action='store', default='', help='Journal of the plays downloaded so far, an interrupted run resumes from it. Removed once the run completes. (Default="./download_journal.jsonl")')
     parser.add_argument('--images_path', dest='images_path', action='store', default='', help='Images path. (Default="./Images")')
     parser.add_argument('--xml_path', dest='xml_path', action='store', default='', help='Game XML Path. (Default="./game_xml")')
     parser.add_argument('--collection_xml', dest='collection_xml', action='store', default='', help='Output collection XML file.(Default="./collection.xml")')
     parser.add_argument('--no_cache', dest='no_cache', action='store_true', help='Turn off all caching (default=Off)')
     parser.add_argument('--no_cache_plays', dest='no_cache_plays', action='store_true', help='Turn off caching for registered plays (default=Off)')
+    parser.add_argument('--shard_size', dest='shard_size', action='store', default='', help='Split the catalog into numbered page files of SHARD_SIZE games, the output file becoming their table of contents. Not available with --serve. (Default=0, one file)')
+    parser.add_argument('--pipeline', dest='pipeline', action='store_true', help='Overlap the BGG requests, the rendering and the image downloads of the catalog. (default=Off)')
+    parser.add_argument('--pipeline_window', dest='pipeline_window', action='store', default='', help='Maximum number of games in flight in the pipeline. (Default=64)')
+    parser.add_argument('--serve', dest='serve', action='store_true', help='Run as a web service answering /catalog, /plays, /not_played and /expansions?username=USER from in-memory caches. (default=Off)')
+    parser.add_argument('--port', dest='port', action='store', default='', help='Port of the web service. (Default=8000)')
+    parser.add_argument('--serve_path', dest='serve_path', action='store', default='', help='Directory of the per user files of the web service. (Default="./users")')
+    parser.add_argument('--refresh', dest='refresh', action='store', default='', help='Seconds after which the web service rebuilds a user in the background. (Default=3600)')
+    parser.add_argument('--cache_users', dest='cache_users', action='store', default='', help='Maximum number of users whose pages are kept in memory by the web service. (Default=100)')
+    parser.add_argument('--cache_entries', dest='cache_entries', action='store', default='', help='Maximum number of parsed XML, plays and rendered entries kept in memory by the web service. (Default=20000)')
+    parser.add_argument('-j','--jobs', dest='jobs', action='store', default='', help='Number of processes used to parse and render the catalog entries, 0 for one per CPU. Not available with --serve. (Default=1)')
     return parser.parse_args()
 
 def get_value(item):
@@ -218,7 +370,7 @@ def get_description_length(config):
     else:
         return 1000
 
-def template_to_output_entry(config, game_info):
+def render_output_entry(config, game_info):
     mechanics_list_max_length = get_mechanics_list_max_length(config)
 
     #Read the template.
@@ -251,12 +403,59 @@ def template_to_output_entry(config, game_info):
     template = template.replace('{{d}}', str(game_info.mintime) + " - " + str(game_info.maxtime) if (int(game_info.mintime) < int(game_info.maxtime)) else str(game_info.mintime))
     template = template.replace('{{Weight}}'        , str(round(float(game_info.avg_weight) * 2, 1) )) #Weight is doubled to be on the same scale with rating.
     template = template.replace('{{Rating}}', str(round(float(game_info.avg_rating), 1)) if ("N/A" in game_info.my_rating) else str(round((float(game_info.avg_rating) + float(game_info.my_rating)) / 2, 1)))
-    
-    template = template.replace('{{LastPlayed}}'      , game_info.lastPlayed                       or "N/A")
 
-    #Write to output.html
+    #{{LastPlayed}} is left in place, it is only known once the plays have been read (see fill_last_played).
+    return template
+
+def fill_last_played(entry, game_info):
+    return entry.replace('{{LastPlayed}}'      , game_info.lastPlayed                       or "N/A")
+
+def template_to_output_entry(config, game_info, entry=None):
+    if(entry is None):
+        entry = render_output_entry(config, game_info)
+
+    if(config.shard_size > 0):
+        entry = shard_entry(entry, game_info)
+
+    #Write to output.html (or the shard page of the game)
+    with open(game_info.output_page, 'a', encoding="utf-8") as file:
+        file.write(fill_last_played(entry, game_info))
+
+def get_shard_output(config, shard):
+    base, ext = os.path.splitext(config.output)
+    return f'{base}-{shard:03d}{ext}'
+
+def shard_entry(entry, game_info):
+    #Anchor the entry for the index links and let the browser defer the box art until it is scrolled to.
+    entry = entry.replace('<img ', '<img loading="lazy" ')
+    return '<a id="game-' + game_info.obj_id + '"></a>' + entry
+
+def start_shard_if_required(config, game_info, catalog_count):
+    if(config.shard_size <= 0):
+        return
+    if(catalog_count % config.shard_size == 0):
+        if(config.shard_outputs):
+            write_output_trailer(config.shard_outputs[-1])
+        config.shard_outputs.append(get_shard_output(config, len(config.shard_outputs) + 1))
+        write_output_header(config, config.shard_outputs[-1])
+    game_info.output_page = config.shard_outputs[-1]
+
+def write_table_of_contents(config, shard_names):
+    if(config.shard_size <= 0):
+        return
+    if(config.shard_outputs):
+        write_output_trailer(config.shard_outputs[-1])
+
     with open(config.output, 'a', encoding="utf-8") as file:
-        file.write(template)
+        file.write('<h2>Contents</h2>\n<ul class="toc">\n')
+        for shard_output, (first, last) in zip(config.shard_outputs, shard_names):
+            file.write('<li><a href="' + os.path.basename(shard_output) + '">' + first + ' - ' + last + '</a></li>\n')
+        file.write('</ul>\n')
+
+def index_entry_name(config, game):
+    if(config.shard_size > 0):
+        return '<a href="' + os.path.basename(game.output_page) + '#game-' + game.obj_id + '">' + game.name + '</a>'
+    return game.name
 
 def download_image(config, game_info):
     if not (config.no_cache):
@@ -265,17 +464,90 @@ def download_image(config, game_info):
             #Download the image to the local cache.
             res = requests.get(game_info.image, stream = True)
             if res.status_code == 200:
-                logging.info("Writing: " + collection_info.game_name + " boxart to " + os.path.join(config.images_path, game_info.obj_id + ".jpg"))
-                with open(os.path.join(config.images_path, game_info.obj_id + ".jpg"), 'wb') as f:
-                    shutil.copyfileobj(res.raw, f)
+                logging.info("Writing: " + game_info.name + " boxart to " + os.path.join(config.images_path, game_info.obj_id + ".jpg"))
+                write_cache_file(os.path.join(config.images_path, game_info.obj_id + ".jpg"), res.raw)
+
+def get_partial_path(path):
+    #Unique per process and thread, several lanes of the pipeline write at the same time.
+    return path + '.' + str(os.getpid()) + '-' + str(threading.get_ident()) + '.part'
 
-def break_if_required(file, line_text, do_break):
+def write_cache_file(path, content):
+    #Everything read back as a cache is written to a partial file then renamed, so an interrupted run never leaves a truncated file behind.
+    partial_path = get_partial_path(path)
+    try:
+        with open(partial_path, 'wb') as file:
+            if(isinstance(content, str)):
+                file.write(content.encode('utf-8'))
+            elif(isinstance(content, bytes)):
+                file.write(content)
+            else:
+                shutil.copyfileobj(content, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(partial_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(partial_path)
+        raise
+
+#A partial file is written in seconds. Older ones were left behind by a killed run, newer ones may belong to a run going on
+#at the same time (web mode starts one run per request, all sharing the XML and images directories).
+partial_files_max_age = 3600
+
+def remove_partial_files(config):
+    patterns = [os.path.join(glob.escape(config.xml_path), '*.part'), os.path.join(glob.escape(config.images_path), '*.part')]
+    patterns += [glob.escape(path) + '.*.part' for path in (config.collection_xml, config.expansions_xml, config.output_xlsx, config.rollups_file, config.journal)]
+    for pattern in patterns:
+        for f in glob.glob(pattern):
+            with contextlib.suppress(FileNotFoundError):
+                if(time() - os.path.getmtime(f) > partial_files_max_age):
+                    os.remove(f)
+
+def sync_file(path):
+    #Files written by xlsxwriter or pickle reach the disk before being renamed into place, as write_cache_file does.
+    with open(path, 'r+b') as file:
+        os.fsync(file.fileno())
+
+def open_download_journal(config):
+    #The journal keeps the plays downloaded so far, a cold run that is interrupted resumes from there instead of requesting them again.
+    #The game XML and images need no journal, their cache files only appear once complete.
+    config.journal_plays = {}
+    if(os.path.exists(config.journal)):
+        records = []
+        with open(config.journal, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    #The last line is cut when the run was killed while writing it.
+                    continue
+                if(record.get('user') == config.user_name and 'xml' in record):
+                    config.journal_plays[record['id']] = record
+                    records.append(line if line.endswith('\n') else line + '\n')
+        #Rewritten with the valid records only, so that the next ones are appended after a complete line.
+        write_cache_file(config.journal, "".join(records))
+        logging.info(f'Resuming from {config.journal}: plays of {len(config.journal_plays)} games already downloaded')
+
+def append_download_journal(config, record):
+    with open(config.journal, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(record) + '\n')
+        file.flush()
+        os.fsync(file.fileno())
+
+def close_download_journal(config):
+    #Every download of the run is stored in its own cache, the journal is not needed anymore.
+    if(config.journal_plays is not None):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(config.journal)
+        config.journal_plays = None
+
+def break_if_required(lines, line_text, do_break):
     if(do_break):
-        file.write("</ul>\n")
-        file.write('<p style="page-break-after: always;"></p>\n')
-        file.write("<ul>\n")
+        lines.append("</ul>\n")
+        lines.append('<p style="page-break-after: always;"></p>\n')
+        lines.append("<ul>\n")
         if(len(line_text) > 0):
-            file.write("<br><li><b>" + line_text + "</b></li>\n")
+            lines.append("<br><li><b>" + line_text + "</b></li>\n")
 
 def write_error_to_output_html_and_close(config, error):
     write_output_header(config)
@@ -298,7 +570,7 @@ def validate_username(config):
     return config.user_name
 
 def clean_up(config):
-    if args.clean_images or args.clean_xml or args.clean_all:
+    if args.clean_images or args.clean_xml or args.clean_plays or args.clean_all:
         logging.info('Cleaning...')
         if args.clean_images or args.clean_all:
             for f in os.listdir(config.images_path):
@@ -309,22 +581,34 @@ def clean_up(config):
         if args.clean_xml or args.clean_all:
             if(os.path.exists(config.collection_xml)):
                 os.remove(config.collection_xml)
+            if(os.path.exists(config.expansions_xml)):
+                os.remove(config.expansions_xml)
             for f in os.listdir(config.xml_path):
                 if(os.path.join(config.xml_path, f)):
                     os.remove(os.path.join(config.xml_path, f))
         if args.clean_plays or args.clean_all:
             if(os.path.exists(config.output_xlsx)):
                 os.remove(config.output_xlsx)
+            if(os.path.exists(config.rollups_file)):
+                os.remove(config.rollups_file)
+            if(os.path.exists(config.journal)):
+                os.remove(config.journal)
         if args.clean_all:
             with contextlib.suppress(FileNotFoundError):
                 os.remove(config.output)
                 os.remove(config.output_plays)
                 os.remove(config.output_not_play)
+                os.remove(config.output_expansions)
                 os.remove(config.collection_xml)
+            #Shards are numbered on 3 digits at least, output-1000.html coming after output-999.html.
+            base, ext = os.path.splitext(config.output)
+            for f in glob.glob(glob.escape(base) + '-[0-9]*' + ext):
+                if(re.fullmatch(r'[0-9]{3,}', f[len(base) + 1:len(f) - len(ext)])):
+                    os.remove(f)
         sys.exit()
 
-def write_output_header(config):
-    with open(config.output, 'w') as file:      
+def write_output_header(config, output=None):
+    with open(output or config.output, 'w') as file:      
         if(config.web_mode):
             if(config.card_mode):
                 file.write('<html><head><link href="{{ url_for(\'static\', filename=\'styles/style_card.css\')}}" rel="stylesheet" type="text/css"></head><body>')
@@ -336,12 +620,13 @@ def write_output_header(config):
             else:
                 file.write('<html><head><link href="style.css" rel="stylesheet" type="text/css"></head><body>')
 
-def write_output_plays_header(config):
-    with open(config.output_plays, 'w') as file:      
+def write_output_plays_header(config, output=None):
+    with open(output or config.output_plays, 'w') as file:      
         if(config.web_mode):
             file.write('<html><head><link href="{{ url_for(\'static\', filename=\'styles/style_plays.css\')}}" rel="stylesheet" type="text/css"></head><body>')
         else:
             file.write('<html><head><link href="style_plays.css" rel="stylesheet" type="text/css"></head><body>')
+        file.write(get_sprite_sheet(config))
 
 def write_output_not_play_header(config):
     with open(config.output_not_play, 'w') as file:      
@@ -349,13 +634,35 @@ def write_output_not_play_header(config):
             file.write('<html><head><link href="{{ url_for(\'static\', filename=\'styles/style_plays.css\')}}" rel="stylesheet" type="text/css"></head><body>')
         else:
             file.write('<html><head><link href="style_plays.css" rel="stylesheet" type="text/css"></head><body>')
-
-def request_collection(config):        
+        file.write(get_sprite_sheet(config))
+
+def get_png_size(path):
+    #Width and height from the IHDR chunk, which always follows the 8 bytes PNG signature.
+    with open(path, 'rb') as file:
+        return struct.unpack('>II', file.read(24)[16:24])
+
+def get_sprite_sheet(config):
+    #Meeples of Images-templates as symbols of one hidden svg, so that each asset is loaded once per page and referenced with <use href="#meeple-red"/>.
+    symbols = []
+    for f in sorted(os.listdir(config.images_template)):
+        name, ext = os.path.splitext(f)
+        if(ext == '.png' and name.startswith('meeple-')):
+            width, height = get_png_size(os.path.join(config.images_template, f))
+            symbols.append(f'<symbol id="{name}" viewBox="0 0 {width} {height}"><image href="{os.path.join(config.images_template, f)}" width="{width}" height="{height}"/></symbol>')
+    return '<svg xmlns="http://www.w3.org/2000/svg" width="0" height="0" style="position:absolute">' + "".join(symbols) + '</svg>'
+
+def request_collection(config, expansions=False):        
     logging.warning('Reading collection from bgg')
 
     status = 0
     params = {'username': config.user_name, 'stats': 1}
 
+    #BGG returns the expansions as subtype boardgame unless they are excluded, so they are asked for separately.
+    if expansions:
+        params['subtype'] = 'boardgameexpansion'
+    else:
+        params['excludesubtype'] = 'boardgameexpansion'
+
     if config.only_own:
         params['own'] = 1
         
@@ -363,63 +670,148 @@ def request_collection(config):
         params['wanttoplay'] = 1
     
     collection_response = bgg_getter('collection',params, config)
-    with open(config.collection_xml, 'w', encoding="utf-8") as file:
-        file.write(collection_response.text)
-        return ElementTree.fromstring(collection_response.content)
-
-def read_collection(config):
+    write_cache_file(config.expansions_xml if expansions else config.collection_xml, collection_response.text)
+    return ElementTree.fromstring(collection_response.content)
+
+def parse_xml_file(config, path):
+    #In server mode the parsed XML stays in memory until the file changes.
+    key = ('xml', path, os.path.getmtime(path))
+    if(config.memory_cache is not None):
+        root = config.memory_cache.get(key)
+        if(root is not None):
+            return root
+
+    with open(path, 'r', encoding="utf-8") as file:
+        root = ElementTree.fromstring(file.read())
+    if(config.memory_cache is not None):
+        config.memory_cache.put(key, root)
+    return root
+
+def read_collection(config, expansions=False):
+    collection_xml = config.expansions_xml if expansions else config.collection_xml
     if not (config.no_cache):
         #Check if collection.xml exists. If it does, read it.
-        if(os.path.exists(config.collection_xml)):
-            logging.warning('Reading ' + config.collection_xml)
-            with open(config.collection_xml, 'r', encoding="utf-8") as file:
-                return ElementTree.fromstring(file.read())
+        if(os.path.exists(collection_xml)):
+            logging.warning('Reading ' + collection_xml)
+            try:
+                return parse_xml_file(config, collection_xml)
+            except ElementTree.ParseError:
+                #Truncated by a run interrupted before the cache writes were atomic.
+                logging.warning(collection_xml + ' is not valid XML, requesting it again')
+                return request_collection(config, expansions)
 
         #Otherwise we request the XML from BGG
         else:
-          return request_collection(config)  
+          return request_collection(config, expansions)  
 
     #Otherwise we request the XML from BGG
     else:
-        return request_collection(config)  
+        return request_collection(config, expansions)  
+
+def filter_collection_subtype(collection, subtype):
+    #Drop the other subtypes (accessories, expansions of a collection.xml cached before they were excluded) before any thing request.
+    items = [item for item in collection if item.attrib.get('subtype', subtype) == subtype]
+    if(len(items) < len(collection)):
+        logging.info(f'Skipping {len(collection) - len(items)} collection items which are not {subtype}')
+    return items
+
+def write_expansions(config):
+    if(config.expansions):
+        expansions = filter_collection_subtype(read_collection(config, expansions=True), 'boardgameexpansion')
+        write_output_header(config, config.output_expansions)
+        with open(config.output_expansions, 'a', encoding="utf-8") as file:
+            file.write("<ul>\n")
+            for item in expansions:
+                year = item.find('yearpublished')
+                file.write("<li>" + item.find('name').text + (" (" + year.text + ")" if year is not None else "") + "</li>\n")
+            file.write("</ul>\n")
+        write_output_trailer(config.output_expansions)
 
 def download_and_split_collection_object_info(config, newids):
     newgamexmls = bgg_getter('thing', {'id': ','.join(newids), 'stats': 1}, config)
     for item in ElementTree.fromstring(newgamexmls.content):
         if not (config.no_cache):
             game_xml_path = os.path.join(config.xml_path, item.attrib['id'] + '.xml')
-            with open(game_xml_path, 'w', encoding='utf-8') as file:
-                logging.info(f'Writing to {game_xml_path}')
-                file.write(ElementTree.tostring(item, encoding='unicode'))
+            logging.info(f'Writing to {game_xml_path}')
+            write_cache_file(game_xml_path, ElementTree.tostring(item, encoding='unicode'))
         else:
             config.dict_game_info[item.attrib['id']] = item
 
 def download_and_store_plays_object_info(config, newid):
-    global playsArrays
-    
+    #Plays downloaded before the previous run was interrupted are read from the journal, which keeps the XML answered by BGG.
+    record = config.journal_plays.get(str(newid)) if config.journal_plays is not None else None
+    if(record is not None):
+        return store_plays_object_info(newid, record['xml'])
+
     newgameplaysxmls = bgg_getter('plays', {'id': str(newid), 'type': 'thing', 'username': config.user_name}, config)
-    
+    if(config.journal_plays is not None):
+        append_download_journal(config, {'user': config.user_name, 'id': str(newid), 'xml': newgameplaysxmls.text})
+    return store_plays_object_info(newid, newgameplaysxmls.content)
+
+def store_plays_object_info(newid, playsXml):
+    global playsColumns
+
     lastPlayed = ""
-    
-    for item in ElementTree.fromstring(newgameplaysxmls.content):
+
+    for item in ElementTree.fromstring(playsXml):
         playersItems = item.find('players')
         if playersItems is not None:
             players = playersItems.findall('player')
             for player in players:
                 if player is not None:
-                    playsArrays.append([newid,
+                    playsColumns.append(int(newid),
                             item.find('item').attrib['name'],
-                            item.attrib['id'],
+                            int(item.attrib['id']),
                             item.attrib['date'],
-                            item.attrib['quantity'],
+                            int(item.attrib['quantity']),
                             player.attrib['name'],
-                            player.attrib['win']])
-                    
+                            int(player.attrib['win']))
+
                     if (item.attrib['date'] > lastPlayed):
                         lastPlayed = item.attrib['date']
-    
+
     return lastPlayed
 
+# Types of the playsDF columns, applied to the plays read back from the Excel file
+plays_dtypes = {'Id_Game': 'int64',
+                'Name': 'category',
+                'Id_Play': 'int64',
+                'Date': 'datetime64[ns]',
+                'Quantity': 'int64',
+                'Player_Name': 'category',
+                'Victory': 'int64'
+                }
+
+def read_plays_file(config):
+    #In server mode the plays frame stays in memory until the Excel file changes.
+    key = ('plays', config.output_xlsx, os.path.getmtime(config.output_xlsx))
+    if(config.memory_cache is not None):
+        playsDF = config.memory_cache.get(key)
+        if(playsDF is not None):
+            return playsDF
+
+    xlObjectPlays = pd.ExcelFile(config.output_xlsx)
+    playsDF = pd.read_excel(xlObjectPlays, sheet_name="Main").astype(plays_dtypes)
+    if(config.memory_cache is not None):
+        config.memory_cache.put(key, playsDF)
+    return playsDF
+
+def format_play_date(date):
+    return pd.Timestamp(date).strftime('%Y-%m-%d')
+
+def get_last_played(config, game_info, lastPlaysDF):
+    #lastPlaysDF holds the plays read back from the Excel file, None when the plays are downloaded.
+    if(config.plays and lastPlaysDF is not None):
+        lastPlayedRow = lastPlaysDF.loc[lastPlaysDF['Id_Game'] == int(game_info.obj_id)]
+        if (len(lastPlayedRow.index) >=1):
+            return format_play_date(lastPlayedRow['Date'].values[0])
+        else:
+            return "N/A"
+    elif (config.plays):
+        return download_and_store_plays_object_info(config, game_info.obj_id)
+    else :
+        return "N/A"
+
 def find_and_download_new_collection_object_info(config, collection):
     newids = set()
     for item in collection:
@@ -438,51 +830,189 @@ def find_and_download_new_collection_object_info(config, collection):
         download_and_split_collection_object_info(config, newids)
         
 
-def gather_index_info(config, gameinfo, item):
-    for count in range(int(gameinfo.minplayers), int(gameinfo.maxplayers)):
-        if(count not in config.dict_player_count):
-            config.dict_player_count[count] = []
-        config.dict_player_count[count].append(gameinfo)
+#Title of each index section, the key being formatted with get_index_label.
+index_titles = {
+    'players'  : '{} player games:',
+    'category' : '{} games:',
+    'mechanic' : '{} games:',
+    'designer' : 'Designed by {}:',
+    'weight'   : 'Weight {}:',
+    'playtime' : 'Playing in {}:',
+}
+
+playtime_bands = [(30, '30 min or less'), (60, '30 min to 1 hour'), (120, '1 to 2 hours'), (240, '2 to 4 hours')]
+
+def get_weight_band(avg_weight):
+    #BGG weight goes from 1 to 5, 0 meaning nobody voted.
+    weight = float(avg_weight or 0)
+    if(weight <= 0):
+        return None
+    return min(int(weight), 4)
 
-    for x in get_links(item, 'boardgamecategory'):
-        category = x.attrib['value']
-        if(category not in config.dict_category):
-            config.dict_category[category] = []
-        config.dict_category[category].append(gameinfo)
+def get_playtime_band(maxtime):
+    if not (maxtime or '').isdigit() or int(maxtime) <= 0:
+        return None
+    for band, (limit, label) in enumerate(playtime_bands):
+        if(int(maxtime) <= limit):
+            return band
+    return len(playtime_bands)
+
+def get_index_label(section, key):
+    if(section == 'weight'):
+        return str(key) + ' - ' + str(key + 1)
+    if(section == 'playtime'):
+        return playtime_bands[key][1] if key < len(playtime_bands) else 'more than 4 hours'
+    return str(key)
+
+def collect_index_info(gameinfo, item):
+    #Index keys of a single game for every section, kept apart from config so that they can be built in a worker process.
+    keys = {section: [] for section in index_titles}
+    if(gameinfo.minplayers.isdigit() and gameinfo.maxplayers.isdigit()):
+        minplayers = max(1, int(gameinfo.minplayers))
+        keys['players'] = list(range(minplayers, max(minplayers, int(gameinfo.maxplayers)) + 1))
+
+    for link in item.findall('link'):
+        if(link.attrib['type'] == 'boardgamecategory'):
+            keys['category'].append(link.attrib['value'])
+        elif(link.attrib['type'] == 'boardgamemechanic'):
+            keys['mechanic'].append(link.attrib['value'])
+        elif(link.attrib['type'] == 'boardgamedesigner'):
+            keys['designer'].append(link.attrib['value'])
+
+    for section, key in (('weight', get_weight_band(gameinfo.avg_weight)), ('playtime', get_playtime_band(gameinfo.maxtime))):
+        if(key is not None):
+            keys[section].append(key)
+    return keys
+
+def merge_index_info(config, gameinfo, keys):
+    #The index only stores game ids, the games themselves are kept once in dict_index_games.
+    config.dict_index_games[gameinfo.obj_id] = gameinfo
+    for section in keys:
+        for key in keys[section]:
+            if(key not in config.dict_index[section]):
+                config.dict_index[section][key] = []
+            config.dict_index[section][key].append(gameinfo.obj_id)
+
+def load_game_items(config, collection_info):
+    #Check to see if the XML already exists. If it does, don't re-request it.
+    if(os.path.exists(collection_info.game_xml) and not config.no_cache):
+        try:
+            return parse_xml_file(config, collection_info.game_xml)
+        except ElementTree.ParseError:
+            #Truncated by a run interrupted before the cache writes were atomic, requested again below.
+            logging.warning(collection_info.game_xml + ' is not valid XML')
+    if not (config.no_cache):
+            logging.error('game not found')
+            #Pull the game info XML
+            game_info_response = bgg_getter('thing', {'id': collection_info.obj_id, 'stats': 1} , config)
+            
+            #Write out the game info XML, the item alone as download_and_split_collection_object_info does.
+            thisgameitems = ElementTree.fromstring(game_info_response.content).find('item')
+            logging.info("Writing: " + collection_info.game_name + " to " + collection_info.game_xml)
+            write_cache_file(collection_info.game_xml, ElementTree.tostring(thisgameitems, encoding='unicode'))
+            return thisgameitems
+    else:
+        return config.dict_game_info[collection_info.obj_id]
+
+def get_catalog_entry_key(config, collection_info):
+    #Everything the rendered entry depends on, None when it cannot be cached.
+    if(config.memory_cache is None or config.no_cache or not os.path.exists(collection_info.game_xml)):
+        return None
+    return ('entry', collection_info.obj_id, os.path.getmtime(collection_info.game_xml), config.card_mode, config.images_path,
+            collection_info.my_rating, collection_info.avg_rating, collection_info.num_plays, collection_info.my_image)
+
+def render_catalog_entry(config, collection_info):
+    #Parse and render one collection item: (collection_info, item type, name, game_info, entry, index keys)
+    key = get_catalog_entry_key(config, collection_info)
+    if(key is not None):
+        cached = config.memory_cache.get(key)
+        if(cached is not None):
+            item_type, name, game_info, entry, index_keys = cached
+            #game_info gets the last played date and page of this build, so each build works on its own copy.
+            if(game_info is not None):
+                game_info = copy.copy(game_info)
+                game_info.output_page = config.output
+            return collection_info, item_type, name, game_info, entry, index_keys
+
+    thisgameitems = load_game_items(config, collection_info)
+    if(thisgameitems.attrib['type'] != "boardgame"):
+        rendered = collection_info, thisgameitems.attrib['type'], get_prop_value(thisgameitems, 'name'), None, None, {}
+    else:
+        game_info = game_information(thisgameitems, config, collection_info)
+        entry = render_output_entry(config, game_info)
+        rendered = collection_info, thisgameitems.attrib['type'], game_info.name, game_info, entry, collect_index_info(game_info, thisgameitems)
+
+    if(key is not None):
+        config.memory_cache.put(key, (rendered[1], rendered[2], copy.copy(rendered[3]), rendered[4], rendered[5]))
+    return rendered
+
+render_worker_config = None
+
+def init_render_worker(config):
+    global render_worker_config
+    render_worker_config = config
+
+def render_catalog_entry_in_worker(collection_info):
+    return render_catalog_entry(render_worker_config, collection_info)
+
+def get_render_jobs(config):
+    if(config.jobs == 0):
+        return os.cpu_count() or 1
+    return config.jobs
+
+def render_catalog_entries(config, collection_infos):
+    #Yields the rendered entries in collection order, using a process pool when more than one job is requested.
+    jobs = get_render_jobs(config)
+    #Workers inherit config (and the in-memory XML of --no_cache) through fork, which is not available everywhere.
+    if(jobs <= 1 or len(collection_infos) <= 1 or 'fork' not in multiprocessing.get_all_start_methods()):
+        for collection_info in collection_infos:
+            yield render_catalog_entry(config, collection_info)
+        return
+
+    #Missing XML is fetched here so that the BGG requests stay serial and throttled.
+    for collection_info in collection_infos:
+        if not (config.no_cache or os.path.exists(collection_info.game_xml)):
+            load_game_items(config, collection_info)
+
+    logging.info(f'Rendering {len(collection_infos)} entries with {jobs} processes')
+    chunksize = max(1, min(32, len(collection_infos) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork'), initializer=init_render_worker, initargs=(config,)) as executor:
+        yield from executor.map(render_catalog_entry_in_worker, collection_infos, chunksize=chunksize)
 
 def write_index(config):
     if(config.index):
-
-        with open(config.output, 'a') as file:
+        lines = []
+        for section in config.index_sections:
             i = 1
             break_point = 250
 
-            file.write('<p style="page-break-after: always;"></p>\n')
-            file.write("<ul>\n")
-            for count in range(1,10):
-                file.write("<br><li><b>" + str(count) + " player games:" + "</b></li>\n")
+            lines.append('<p style="page-break-after: always;"></p>\n')
+            lines.append("<ul>\n")
+            for key in sorted(config.dict_index[section]):
+                title = index_titles[section].format(get_index_label(section, key))
+                lines.append("<br><li><b>" + title + "</b></li>\n")
                 i += 1
-                break_if_required(file, "",i % break_point == 0)
-                for game in config.dict_player_count[count]:
-                    file.write("<li>" + game.name + "</li>\n")
+                break_if_required(lines, "", i % break_point == 0)
+                for obj_id in config.dict_index[section][key]:
+                    lines.append("<li>" + index_entry_name(config, config.dict_index_games[obj_id]) + "</li>\n")
                     i += 1
-                    break_if_required(file, str(count) + " player games:", i % break_point == 0)
-            file.write("</ul>\n")
+                    break_if_required(lines, title, i % break_point == 0)
+            lines.append("</ul>\n")
 
-            i = 1
-            break_point = 250
+        with open(config.output, 'a', encoding="utf-8") as file:
+            file.write("".join(lines))
 
-            file.write('<p style="page-break-after: always;"></p>\n')
-            file.write('<ul>\n')
-            for cat in sorted(config.dict_category):
-                file.write("<br><li><b>" + str(cat) + " games:" + "</b></li>\n")
-                i += 1
-                break_if_required(file, "", i % break_point == 0)
-                for game in config.dict_category[cat]:
-                    file.write("<li>" + game.name + "</li>\n")
-                    i += 1
-                    break_if_required(file, str(cat) + " games:", i % break_point == 0)
-            file.write("</ul>\n")
+def write_index_json(config):
+    if(len(config.index_json) > 0):
+        index = {'games': {}, 'indexes': {}}
+        for obj_id, game in config.dict_index_games.items():
+            index['games'][obj_id] = {'name': game.name, 'page': os.path.basename(game.output_page)}
+        for section in index_titles:
+            index['indexes'][section] = {get_index_label(section, key): config.dict_index[section][key] for key in sorted(config.dict_index[section])}
+
+        logging.info('Writing index to ' + config.index_json)
+        with open(config.index_json, 'w', encoding="utf-8") as file:
+            json.dump(index, file, ensure_ascii=False)
 
 def write_output_trailer(outputFileName):
     #Write the html trailer.
@@ -501,423 +1031,777 @@ def getImage(path, zoom=1):
 #                       anti_aliasing=True)
 #image_downscaled = downscale_local_mean(image, (4, 3))
 
-def xlxs_size(worksheet): # output the size of the written data in an excel sheet : max number of row, max number of column (starting with 0)
-    return worksheet.dim_rowmax,worksheet.dim_colmax
-
-def write_plays_excelfile(config, current_year, playsDF, lastPlays2023DF, lastPlaysBefore2023DF, groupedPlaysPerGame2023DF, groupedPlaysPerGameDF, groupedVictoryPlays2023DF, groupedVictoryPlaysDF, groupedPlayerDF, groupedPlaysPerGamePerPlayer2023DF): #Saving the various dataframe about registered plays to an Excel file
-    pandas.io.formats.excel.ExcelFormatter.header_style = None
-    excel = pd.ExcelWriter(config.output_xlsx,datetime_format='dd/mm/yyyy',date_format='dd/mm/yyyy')
-    workbook = excel.book
+#Sheet key and title, current_year being formatted in the title.
+plays_sheet_titles = {
+    'main'                      : 'Main',
+    'last_plays'                : '{}_Last_Plays',
+    'last_plays_before'         : 'Bef_{}_Last_Plays',
+    'plays_per_game'            : '{}_PlaysPerGame',
+    'plays_per_game_all'        : 'AllYear_PlaysPerGame',
+    'victory_plays'             : '{}_Victory_Plays',
+    'victory_plays_all'         : 'AllYear_Victory_Plays',
+    'player_count'              : 'Player_Count',
+    'plays_per_player_per_game' : '{}_PlaysPerPlayerPerGame',
+}
+
+plays_export_formats = ['xlsx', 'csv', 'parquet']
+
+def write_plays_export(config, current_year, playsDF, lastPlays2023DF, lastPlaysBefore2023DF, groupedPlaysPerGame2023DF, groupedPlaysPerGameDF, groupedVictoryPlays2023DF, groupedVictoryPlaysDF, groupedPlayerDF, groupedPlaysPerGamePerPlayer2023DF): #Saving the various dataframe about registered plays to an Excel file (and/or CSV, Parquet files)
+    frames = {
+        'main'                      : playsDF,
+        'last_plays'                : lastPlays2023DF,
+        'last_plays_before'         : lastPlaysBefore2023DF,
+        'plays_per_game'            : groupedPlaysPerGame2023DF,
+        'plays_per_game_all'        : groupedPlaysPerGameDF,
+        'victory_plays'             : groupedVictoryPlays2023DF,
+        'victory_plays_all'         : groupedVictoryPlaysDF,
+        'player_count'              : groupedPlayerDF,
+        'plays_per_player_per_game' : groupedPlaysPerGamePerPlayer2023DF,
+    }
+    #Main is the plays cache read back on the next run, it is always exported.
+    sheets = [(plays_sheet_titles[key].format(current_year), frames[key]) for key in plays_sheet_titles if key == 'main' or key in config.plays_sheets]
+
+    if('xlsx' in config.plays_export):
+        write_plays_excelfile(config, sheets)
+    if('csv' in config.plays_export):
+        for title, dataFrame in sheets:
+            dataFrame.to_csv(get_plays_export_path(config, title, '.csv'), index=False)
+    if('parquet' in config.plays_export):
+        try:
+            for title, dataFrame in sheets:
+                dataFrame.to_parquet(get_plays_export_path(config, title, '.parquet'), index=False)
+        except ImportError as e:
+            logging.warning('Parquet export skipped: ' + str(e))
+
+def get_plays_export_path(config, title, ext):
+    return os.path.splitext(config.output_xlsx)[0] + '_' + title + ext
+
+def write_plays_excelfile(config, sheets):
+    #constant_memory flushes each row to disk once written, so only the current row of the current sheet is held in memory.
+    #Plays.xlsx is the plays cache, it replaces the previous one once complete.
+    partial_xlsx = get_partial_path(config.output_xlsx)
+    workbook = xlsxwriter.Workbook(partial_xlsx, {'constant_memory': True, 'default_date_format': 'dd/mm/yyyy'})
     titleFormat = workbook.add_format({'bg_color': '#DDEBF7','bold':True})
-    
-    store_spreadsheet(playsDF, titleFormat, 'Main', excel)
-    store_spreadsheet(lastPlays2023DF, titleFormat, current_year+'_Last_Plays', excel)
-    store_spreadsheet(lastPlaysBefore2023DF, titleFormat, 'Bef_'+current_year+'_Last_Plays', excel)
-    store_spreadsheet(groupedPlaysPerGame2023DF, titleFormat, current_year+'_PlaysPerGame', excel)
-    store_spreadsheet(groupedPlaysPerGameDF, titleFormat, 'AllYear_PlaysPerGame', excel)
-    store_spreadsheet(groupedVictoryPlays2023DF, titleFormat, current_year+'_Victory_Plays', excel)
-    store_spreadsheet(groupedVictoryPlaysDF, titleFormat, 'AllYear_Victory_Plays', excel)
-    store_spreadsheet(groupedPlayerDF, titleFormat, 'Player_Count', excel)
-    store_spreadsheet(groupedPlaysPerGamePerPlayer2023DF, titleFormat, current_year+'_PlaysPerPlayerPerGame', excel)
-    
+
+    for title, dataFrame in sheets:
+        store_spreadsheet(dataFrame, titleFormat, title, workbook)
+
     try:
-        excel.save()
+        workbook.close()
+        sync_file(partial_xlsx)
+        os.replace(partial_xlsx, config.output_xlsx)
     except Exception as e:
-        print(str(e))
+        logging.error(str(e))
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(partial_xlsx)
+
+spreadsheet_chunk_rows = 10000
 
-def store_spreadsheet(dataFrame, titleFormat, spreadsheetTitle, excel): # Attaching dataframe data into an Excel spreadsheet
-    dataFrame.to_excel(excel, sheet_name=spreadsheetTitle,index=False)
-    ws = excel.sheets[spreadsheetTitle]
-    row,col = xlxs_size(ws)
-    ws.autofilter(0,0,row,col)
+def store_spreadsheet(dataFrame, titleFormat, spreadsheetTitle, workbook): # Streaming dataframe rows into an Excel spreadsheet
+    ws = workbook.add_worksheet(spreadsheetTitle)
+    #Rows must be written in order in constant_memory mode, so the header format is set before anything is written.
     ws.set_row(0, 20.14, titleFormat)
+    ws.write_row(0, 0, [str(column) for column in dataFrame.columns])
+    #Rows are turned into Python values one chunk at a time, never the whole frame.
+    for start in range(0, len(dataFrame.index), spreadsheet_chunk_rows):
+        chunk = dataFrame.iloc[start:start + spreadsheet_chunk_rows]
+        rows = chunk.astype(object).where(chunk.notna(), None)
+        for row, values in enumerate(rows.itertuples(index=False, name=None), start=start + 1):
+            ws.write_row(row, 0, values)
+    ws.autofilter(0, 0, len(dataFrame.index), max(0, len(dataFrame.columns) - 1))
+
+#Rollups are aggregated per month (yyyymm), per game and per game and player.
+rollup_keys = {
+    'games'   : ['Id_Game', 'Name', 'Month'],
+    'players' : ['Id_Game', 'Name', 'Player_Name', 'Month'],
+}
+rollup_aggregations = {
+    'games'   : {'Quantity': 'sum', 'Date': 'max'},
+    'players' : {'Quantity': 'sum', 'Victory': 'sum', 'NB_VictoryInt': 'sum', 'Date': 'max'},
+}
+
+def get_play_fingerprints(playsDF):
+    #One hash per play over all of its rows, a play edited on BGG (winner, quantity, date...) gets another fingerprint.
+    rowHashes = pd.util.hash_pandas_object(playsDF[list(plays_dtypes)], index=False)
+    return rowHashes.groupby(playsDF['Id_Play'].values).sum()
+
+def build_plays_rollups(playsDF):
+    plays = playsDF.assign(Month=playsDF['Date'].dt.year * 100 + playsDF['Date'].dt.month, NB_VictoryInt=playsDF['Quantity'] * playsDF['Victory'])
+    rollups = {'fingerprints': get_play_fingerprints(playsDF)}
+    #A play is counted once for the game, whatever its number of players.
+    rollups['games'] = plays.drop_duplicates('Id_Play').groupby(rollup_keys['games'], observed=True, as_index=False).agg(rollup_aggregations['games'])
+    rollups['players'] = plays.groupby(rollup_keys['players'], observed=True, as_index=False).agg(rollup_aggregations['players'])
+    return rollups
+
+def merge_plays_rollups(rollups, newRollups):
+    merged = {'fingerprints': pd.concat([rollups['fingerprints'], newRollups['fingerprints']])}
+    for table in rollup_keys:
+        merged[table] = pd.concat([rollups[table], newRollups[table]]).groupby(rollup_keys[table], observed=True, as_index=False).agg(rollup_aggregations[table])
+    return merged
+
+def update_plays_rollups(config, playsDF):
+    #Only the plays that are not rolled up yet are aggregated, unless some rolled up play was deleted or edited on BGG.
+    rollups = None
+    if(os.path.exists(config.rollups_file) and not config.no_cache_plays):
+        rollups = pd.read_pickle(config.rollups_file)
+        fingerprints = get_play_fingerprints(playsDF)
+        rolledUp = rollups.get('fingerprints')
+        if(rolledUp is None):
+            logging.info('Rollups without play fingerprints, rebuilding the rollups')
+            rollups = None
+        elif not (rolledUp.index.isin(fingerprints.index).all() and (fingerprints.loc[rolledUp.index].values == rolledUp.values).all()):
+            logging.info('Some rolled up plays were deleted or edited, rebuilding the rollups')
+            rollups = None
+
+    if(rollups is None):
+        rollups = build_plays_rollups(playsDF)
+    else:
+        newPlaysDF = playsDF.loc[~playsDF['Id_Play'].isin(rollups['fingerprints'].index)]
+        logging.info(f'Rolling up {newPlaysDF["Id_Play"].nunique()} new plays')
+        if(len(newPlaysDF.index) > 0):
+            rollups = merge_plays_rollups(rollups, build_plays_rollups(newPlaysDF))
+
+    partial_rollups = get_partial_path(config.rollups_file)
+    pd.to_pickle(rollups, partial_rollups)
+    sync_file(partial_rollups)
+    os.replace(partial_rollups, config.rollups_file)
+    return rollups
+
+def get_month(date):
+    return date.year * 100 + date.month
+
+def parse_recap_window(window):
+    #Returns (label, first month, last month) for a year (2022), the last N months (last12) or a month range (2023-03:2023-08).
+    if(re.fullmatch(r'last[1-9][0-9]*', window)):
+        today = datetime.now().date()
+        months = today.year * 12 + today.month - 1 - (int(window[4:]) - 1)
+        return window, (months // 12) * 100 + months % 12 + 1, get_month(today)
+    monthRange = re.fullmatch(r'([0-9]{4})-([0-9]{2}):([0-9]{4})-([0-9]{2})', window)
+    if(monthRange):
+        startMonth = int(monthRange.group(1)) * 100 + int(monthRange.group(2))
+        endMonth = int(monthRange.group(3)) * 100 + int(monthRange.group(4))
+        if not (1 <= int(monthRange.group(2)) <= 12 and 1 <= int(monthRange.group(4)) <= 12 and startMonth <= endMonth):
+            raise ValueError(f'invalid month range {window}')
+        return window.replace(':', '_'), startMonth, endMonth
+    if(re.fullmatch(r'[0-9]{4}', window)):
+        return window, int(window) * 100 + 1, int(window) * 100 + 12
+    raise ValueError(f'invalid window {window}, expecting a year (2022), the last N months (last12) or a month range (2023-03:2023-08)')
+
+def plays_window_report(rollups, startMonth=None, endMonth=None):
+    #Plays report between two months (yyyymm, included), answered from the rollups only.
+    games = rollups['games']
+    players = rollups['players']
+    if(startMonth is not None):
+        games = games.loc[games['Month'] >= startMonth]
+        players = players.loc[players['Month'] >= startMonth]
+    if(endMonth is not None):
+        games = games.loc[games['Month'] <= endMonth]
+        players = players.loc[players['Month'] <= endMonth]
+
+    report = {}
+    report['last_plays'] = games.groupby(['Id_Game', 'Name'], observed=True, as_index=False).agg({'Date': 'max'})
+    report['plays_per_game'] = games.groupby(['Id_Game', 'Name'], observed=True, as_index=False).agg({'Quantity': 'sum'})
+    report['plays_per_game_per_player'] = players.groupby(['Id_Game', 'Name', 'Player_Name'], observed=True, as_index=False).agg({'Quantity': 'sum'})
+    report['victory_plays'] = players.groupby(['Id_Game', 'Name', 'Player_Name'], observed=True, as_index=False).agg({'NB_VictoryInt': 'sum'})
+    report['player_victories'] = players.groupby(['Player_Name'], observed=True, as_index=False).agg({'Victory': 'sum'}).sort_values(by=['Victory'], ascending=False)
+    return report
+
+def render_victory_pie_svg(pieData):
+    #Same drawing as the matplotlib pie (640x480, starting at 3 o'clock counterclockwise, player names around, percentages above 5%), without matplotlib.
+    cx, cy, r = 320, 240, 186
+    total = sum(wins for player, wins, color in pieData)
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="640" height="480" viewBox="0 0 640 480" font-family="sans-serif" font-size="22" text-anchor="middle" dominant-baseline="central">']
+    labels = []
+    angle = 0.0
+    for player, wins, color in pieData:
+        sweep = 2 * math.pi * wins / total
+        #Like matplotlib, every player is named at 1.1 radius, left aligned on the right side and right aligned on the left side.
+        middle = angle + sweep / 2
+        labels.append(f'<text x="{cx + 1.1 * r * math.cos(middle):.2f}" y="{cy - 1.1 * r * math.sin(middle):.2f}" text-anchor="{"start" if math.cos(middle) > 0 else "end"}">{html.escape(str(player))}</text>')
+        if(wins <= 0):
+            continue
+        if(wins == total):
+            parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{color}"/>')
+        else:
+            x1, y1 = cx + r * math.cos(angle), cy - r * math.sin(angle)
+            x2, y2 = cx + r * math.cos(angle + sweep), cy - r * math.sin(angle + sweep)
+            parts.append(f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{r},{r} 0 {1 if sweep > math.pi else 0},0 {x2:.2f},{y2:.2f} Z" fill="{color}"/>')
+        percent = 100 * wins / total
+        if(percent > 5):
+            labels.append(f'<text x="{cx + 0.6 * r * math.cos(middle):.2f}" y="{cy - 0.6 * r * math.sin(middle):.2f}" fill="{"white" if color == "black" else "black"}">{percent:.1f}</text>')
+        angle += sweep
+    parts.extend(labels)
+    parts.append('</svg>')
+    return "".join(parts)
+
+def render_victory_pie_png(pieData, path):
+    #matplotlib is only imported when asked for, it is not needed for the SVG pies.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.rcParams.update({'font.size': 22})
+
+    fig, ax = plt.subplots()
+    ax.pie([wins for player, wins, color in pieData], labels=[player for player, wins, color in pieData], colors=[color for player, wins, color in pieData], autopct=lambda p: format(p, '.1f') if p > 5 else None)
+    fig.savefig(path, transparent=True)
+    plt.close(fig)
+    return path
+
+def get_meeple_color(playerName):
+    global meeplesAssociated, meeplesAvailable
 
-######### End Functions #########
+    if (playerName not in meeplesAssociated):
+        if (len(meeplesAvailable) >0):
+            meepleColor = meeplesAvailable[0]
+            meeplesAvailable.remove(meepleColor)
+        else:
+            meepleColor = "white"
+            
+        meeplesAssociated[playerName] = meepleColor
+    #EndIf
+    return meeplesAssociated[playerName]
+
+def render_meeples(config, meepleColor, victory):
+    #The symbol viewBox holds the size of the PNG, the use element scales it to the glyph size.
+    meeple = '<svg class="meeple" width="20" height="20"><use href="#meeple-' + meepleColor + '" width="20" height="20"/></svg> '
+    if(victory > config.meeple_limit):
+        return meeple + '<span class="meeple_count">&times;' + str(victory) + '</span> '
+    return meeple * victory
+
+def render_victory_results(config, resultsReport, gameId):
+    victoryPlaysRows = resultsReport['victory_plays'].loc[resultsReport['victory_plays']['Id_Game'] == gameId]
+    playsRows = resultsReport['plays_per_game_per_player'].loc[resultsReport['plays_per_game_per_player']['Id_Game'] == gameId]
+    playerPlays = dict(zip(playsRows['Player_Name'].astype(str), playsRows['Quantity']))
+
+    results = []
+    for playerName, victory in zip(victoryPlaysRows['Player_Name'].astype(str), victoryPlaysRows['NB_VictoryInt']):
+        meepleColor = get_meeple_color(playerName)
+        players_nbPlays = str(playerPlays.get(playerName, "999"))
+        results.append("<b>" + playerName + "</b>: " + str(victory) + " / " + players_nbPlays + " - " + render_meeples(config, meepleColor, int(victory)) + "<br>")
+    return "".join(results)
+
+def write_plays_page(config, output, template_text, gamesDF, periodReport, allReport, pie_suffix):
+    #One entry per game of gamesDF; {{TP2023}} and the results come from periodReport (all plays when None), the pie from allReport.
+    resultsReport = periodReport or allReport
+    for index, row in gamesDF.iterrows():
+        template = template_text
+        
+        gameId = row['Id_Game']
+        
+        #Replace values in the template.
+        if(config.no_cache):
+            template = template.replace('{{image}}'     , game_info.image or "") ####game_info does not exist here bad copy paste
+        else:
+            template = template.replace('{{image}}'     , os.path.join(config.images_path, str(gameId) + ".jpg") or "")
+        
+        
+        template = template.replace('{{GameId}}'      , str(gameId)                            or "")
+        template = template.replace('{{GameName}}'      , row['Name']                            or "N/A")
+        template = template.replace('{{LastPlayed}}'    , format_play_date(row['Date'])               or "N/A")
+        
+        nbPlays2023 = "N/A"
+        if(periodReport is not None):
+            nbPlays2023Row = periodReport['plays_per_game'].loc[periodReport['plays_per_game']['Id_Game'] == gameId]
+            if (len(nbPlays2023Row.index) >=1):
+                nbPlays2023 = str(nbPlays2023Row['Quantity'].values[0])
+        template = template.replace('{{TP2023}}'        , nbPlays2023                               or "N/A")
+        
+        nbPlaysAllYearRow = allReport['plays_per_game'].loc[allReport['plays_per_game']['Id_Game'] == gameId]
+        if (len(nbPlaysAllYearRow.index) >=1):
+            nbPlaysAllYear = str(nbPlaysAllYearRow['Quantity'].values[0])
+        else:
+            nbPlaysAllYear = "N/A"
+        template = template.replace('{{TPAll}}'         , nbPlaysAllYear                            or "N/A")
+        
+        
+        groupedVictoryPlaysRows = allReport['victory_plays'].loc[allReport['victory_plays']['Id_Game'] == gameId]
+        nbVictoryRows = groupedVictoryPlaysRows.loc[groupedVictoryPlaysRows['NB_VictoryInt'] > 0]
+        if (len(nbVictoryRows.index) >= 1):
+            #(player, wins, color) sorted by wins, rows being already one per player.
+            pieData = sorted(((str(player), int(wins), meeplesAssociated[str(player)]) for player, wins in zip(groupedVictoryPlaysRows['Player_Name'], groupedVictoryPlaysRows['NB_VictoryInt'])), key=lambda x: x[1], reverse=True)
+            if(config.chart_engine == 'matplotlib'):
+                template = template.replace('{{victoryPie}}'     , render_victory_pie_png(pieData, os.path.join(config.images_path, str(gameId) + pie_suffix + ".png")))
+            else:
+                template = template.replace('{{victoryPie}}'     , 'data:image/svg+xml,' + quote(render_victory_pie_svg(pieData)))
+        else:
+            template = template.replace('{{victoryPie}}'     , os.path.join(config.images_template, "looser-result.png") or "")
+        
+        results = render_victory_results(config, resultsReport, gameId)
+        
+        template = template.replace('{{Results}}'         , results                            or "N/A")
+        
+        #Write to the plays page
+        with open(output, 'a', encoding="utf-8") as file:
+            file.write(template)
+
+def chain_stage(future, executor, fn, *args):
+    #Runs fn(result of future, *args) on executor once future is done, and returns the future of that call.
+    stage = Future()
+
+    #When a stage fails the executors are shut down with their queued calls cancelled, the following stages are then cancelled too.
+    def copy_result(done):
+        if(done.cancelled()):
+            stage.cancel()
+        elif(done.exception() is not None):
+            stage.set_exception(done.exception())
+        else:
+            stage.set_result(done.result())
 
-global playsArrays
+    def submit(done):
+        if(done.cancelled()):
+            stage.cancel()
+        elif(done.exception() is not None):
+            stage.set_exception(done.exception())
+        else:
+            try:
+                executor.submit(fn, done.result(), *args).add_done_callback(copy_result)
+            except RuntimeError:
+                #executor already shut down
+                stage.cancel()
+
+    future.add_done_callback(submit)
+    return stage
+
+def download_collection_object_batch(config, collection_infos):
+    download_and_split_collection_object_info(config, [collection_info.obj_id for collection_info in collection_infos])
+    #Fallback for the ids missing in the batch answer, still on the BGG lane.
+    for collection_info in collection_infos:
+        if not (config.no_cache or os.path.exists(collection_info.game_xml)):
+            load_game_items(config, collection_info)
+
+def pipeline_render(previous, collection_info):
+    return render_catalog_entry_in_worker(collection_info)
+
+def pipeline_last_played(rendered, config, lastPlaysDF):
+    collection_info, item_type, name, game_info, entry, index_keys = rendered
+    if(item_type == "boardgame"):
+        game_info.lastPlayed = get_last_played(config, game_info, lastPlaysDF)
+    return rendered
+
+def pipeline_image(rendered, config):
+    collection_info, item_type, name, game_info, entry, index_keys = rendered
+    if(item_type == "boardgame"):
+        download_image(config, game_info)
+
+def run_catalog_pipeline(config, collection_infos, lastPlaysDF):
+    #Stages overlap instead of running one game at a time:
+    # - bgg: one thread, every BGG API request (thing batches, plays) goes through it so that the throttling of bgg_getter is kept,
+    # - render: parse and render, in a process pool when more than one job is requested,
+    # - io: image downloads and cached last played lookups.
+    #Entries are yielded in collection order, with at most pipeline_window games in flight and pipeline_window images pending.
+    jobs = get_render_jobs(config)
+    init_render_worker(config)
+    bgg = ThreadPoolExecutor(max_workers=1)
+    io = ThreadPoolExecutor(max_workers=4)
+    #Workers forked before a --no_cache batch lands would not see its XML, so --no_cache renders in a thread.
+    if(jobs > 1 and not config.no_cache and 'fork' in multiprocessing.get_all_start_methods()):
+        render = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork'), initializer=init_render_worker, initargs=(config,))
+        #The workers are forked on the first call, it is made here before the bgg and io threads exist rather than from their callbacks.
+        render.submit(os.getpid).result()
+    else:
+        render = ThreadPoolExecutor(max_workers=1)
+
+    #Every thing batch is queued on the BGG lane up front, cached games are ready straight away.
+    ready = Future()
+    ready.set_result(None)
+    xml_futures = {}
+    newids = []
+    for collection_info in collection_infos + [None]:
+        if(collection_info is not None and (config.no_cache or not os.path.exists(collection_info.game_xml))):
+            newids.append(collection_info)
+        if(len(newids) > 100 or (collection_info is None and newids)):
+            batch = bgg.submit(download_collection_object_batch, config, newids)
+            for new in newids:
+                xml_futures[new.obj_id] = batch
+            newids = []
+
+    plays_executor = bgg if (config.plays and lastPlaysDF is None) else io
+    in_flight = deque()
+    images = deque()
+    pending = iter(collection_infos)
+    try:
+        while True:
+            while(images and images[0].done()):
+                images.popleft().result()
+            while(len(in_flight) < config.pipeline_window and len(images) < config.pipeline_window):
+                collection_info = next(pending, None)
+                if(collection_info is None):
+                    break
+                rendered = chain_stage(xml_futures.get(collection_info.obj_id, ready), render, pipeline_render, collection_info)
+                images.append(chain_stage(rendered, io, pipeline_image, config))
+                in_flight.append(chain_stage(rendered, plays_executor, pipeline_last_played, config, lastPlaysDF))
+            if(in_flight):
+                yield in_flight.popleft().result()
+            elif(images):
+                images.popleft().result()
+            else:
+                break
+    finally:
+        for executor in (bgg, render, io):
+            executor.shutdown(wait=True, cancel_futures=True)
 
-#Get arguments.
-args = parse_arguments()
+def build(config):
+    #Build every output for config.user_name, from the collection to the plays pages.
+    global playsColumns, meeplesAssociated, meeplesAvailable, game_info
 
-#Create config.
-config = config(args)
+    # Create the XML path if it does not exist.
+    os.makedirs(config.xml_path, exist_ok=True)
+    remove_partial_files(config)
 
-#Set loging level.
-logging.basicConfig(level=config.LOGLEVEL)
+    #Validate the username
+    config.user_name = validate_username(config)
 
-#Cleanup if args set.
-clean_up(config)
+    logging.info('starting')
 
-# Create the XML path if it does not exist.
-os.makedirs(config.xml_path, exist_ok=True)
+    #Write the html header and link to the approprate CSS file.
+    write_output_header(config)
 
-#Validate the username
-config.user_name = validate_username(config)
+    #Read in the collection xml file, keeping only the board games.
+    items = filter_collection_subtype(read_collection(config), 'boardgame')
 
-logging.info('starting')
+    #List the expansions apart, without any thing request.
+    write_expansions(config)
 
-#Write the html header and link to the approprate CSS file.
-write_output_header(config)
+    data = []
+    playsColumns = plays_columns()
 
-#Read in the collection xml file.
-items = read_collection(config)
+    if(config.plays and os.path.exists(config.output_xlsx) and not config.no_cache_plays):#Reading existing Excel file where registered plays are stored
+        print("Reading plays file")
+        playsDF = read_plays_file(config)
+        lastPlaysDF = playsDF[['Id_Game', 'Name', 'Date']].pivot_table(index=['Id_Game', 'Name'], values='Date', aggfunc='max', observed=True).reset_index()
+    else:
+        lastPlaysDF = None
+        #The plays are downloaded game by game, an interrupted run resumes from the journal.
+        if(config.plays and not config.no_cache):
+            open_download_journal(config)
+    #End of If
 
-find_and_download_new_collection_object_info(config, items)
+    #Parsing user collection XML
+    #Grab only games we own unless own isn't set.
+    collection_infos = [collection_info for collection_info in (collection_information(item, config) for item in items) if config.only_own == False or collection_info.own]
 
-data = []
-playsArrays = []
+    catalog_count = 0
+    shard_names = []
 
-if(config.plays and os.path.exists(config.output_xlsx) and not config.no_cache_plays):#Reading existing Excel file where registered plays are stored
-    print("Reading plays file")
-    xlObjectPlays = pd.ExcelFile(config.output_xlsx)
-    playsDF = pd.read_excel(xlObjectPlays, sheet_name="Main")
-    lastPlaysDF = playsDF[['Id_Game', 'Name', 'Date']].pivot_table(index=['Id_Game', 'Name'], values='Date', aggfunc='max').reset_index()
-#End of If
+    if(config.pipeline):
+        catalog_entries = run_catalog_pipeline(config, collection_infos, lastPlaysDF)
+    else:
+        find_and_download_new_collection_object_info(config, items)
+        catalog_entries = render_catalog_entries(config, collection_infos)
 
-#Parsing user collection XML
-for item in items:
-    collection_info = collection_information(item, config)
+    for collection_info, item_type, name, game_info, entry, index_keys in catalog_entries:
+        #Now that we have all of the information we need, create the HTML page.
+        if(item_type == "boardgame"):
+            start_shard_if_required(config, game_info, catalog_count)
+            if(config.shard_size > 0):
+                if(catalog_count % config.shard_size == 0):
+                    shard_names.append([game_info.name, game_info.name])
+                shard_names[-1][1] = game_info.name
+            catalog_count += 1
+            #The pipeline already downloaded the image and set the last played date.
+            if not (config.pipeline):
+                download_image(config, game_info)
+                game_info.lastPlayed = get_last_played(config, game_info, lastPlaysDF)
+
+            template_to_output_entry(config, game_info, entry)
+            merge_index_info(config, game_info, index_keys)
 
-    #Grab only games we own unless own isn't set.
-    if(config.only_own == False or collection_info.own):
-        #Check to see if the XML already exists. If it does, don't re-request it.
-        if(os.path.exists(collection_info.game_xml) and not config.no_cache):
-            with open(collection_info.game_xml, 'r', encoding="utf-8") as file:
-                thisgameitems = ElementTree.fromstring(file.read())
-        elif not (config.no_cache):
-                logging.error('game not found')
-                #Pull the game info XML
-                game_info_response = bgg_getter('thing', {'id': collection_info.obj_id, 'stats': 1} , config)
-                
-                #Write out the game info XML.
-                with open(collection_info.game_xml, 'w', encoding="utf-8") as file:
-                    logging.info("Writing: " + collection_info.game_name + " to " + collection_info.game_xml)
-                    file.write(game_info_response.text)
-                    thisgameitems = ElementTree.fromstring(game_info_response.content)
-        else:
-            thisgameitems = config.dict_game_info[collection_info.obj_id]
 
-        #Now that we have all of the information we need, create the HTML page.
-        if(thisgameitems.attrib['type'] == "boardgame"):
-            game_info = game_information(thisgameitems, config, collection_info)
-            download_image(config, game_info)
-            
-            if(config.plays and os.path.exists(config.output_xlsx) and not config.no_cache_plays):
-                lastPlayedRow = lastPlaysDF.loc[lastPlaysDF['Id_Game'] == int(game_info.obj_id)]
-                if (len(lastPlayedRow.index) >=1):
-                    lastPlayed = str(lastPlayedRow['Date'].values[0])
-                else:
-                    lastPlayed = "N/A"
-                
-                game_info.lastPlayed = lastPlayed
-            elif (config.plays):
-                lastPlayed = download_and_store_plays_object_info(config, game_info.obj_id)
-                game_info.lastPlayed = lastPlayed
-            else :
-                lastPlayed = "N/A"
-            
-            template_to_output_entry(config, game_info)
-            gather_index_info(config, game_info, thisgameitems)
-            
-            
             data.append([game_info.obj_id,
                             game_info.name,
                             float(game_info.mintime),
                             float(game_info.maxtime),
                             float(game_info.avg_weight),
                             str(os.path.join(config.images_path, game_info.obj_id + ".jpg"))])
-            
-        else:
-            expName = get_prop_value(thisgameitems, 'name')
-            expansion = thisgameitems.attrib['type']
-            logging.info(f'Expansion: {expName}')
-            logging.info(f'Expansion - type: {expansion}')
-
-
-
-#Write the index.
-write_index(config)
 
-#Write the trailer.
-write_output_trailer(config.output)
-
-#If plays is not to be proceed, we end the script here
-if not (config.plays):
-    endtime = datetime.now()
-    totaltime = endtime - starttime
-    logging.info(f'command: {sys.argv}')
-    logging.info(f'total time: {totaltime}')
-    sys.exit()
-
-if(os.path.exists(config.output_xlsx) and not config.no_cache_plays):
-    print("Re-using loaded data for plays")
-else:
-    playsDF = pd.DataFrame(playsArrays)
-    playsDF.columns = ['Id_Game', 'Name', 'Id_Play', 'Date', 'Quantity', 'Player_Name', 'Victory']
-#End of IF    
-
-# using dictionary to convert specific columns
-convert_dict = {'Id_Game': int,
-                    'Id_Play': int,
-                    'Quantity': int,
-                    'Victory': int
-                    }
-playsDF = playsDF.astype(convert_dict)
+        else:
+            logging.info(f'Expansion: {name}')
+            logging.info(f'Expansion - type: {item_type}')
 
-#Manage date and year for filter
-starting_day_of_current_year = datetime.now().date().replace(month=1, day=1)  
-current_year = str(starting_day_of_current_year.strftime("%Y"))
-starting_day_of_current_year = str(starting_day_of_current_year.strftime("%Y-%m-%d"))
-logging.info("Current year for processing games static: "+current_year)
-logging.info("First day of the current year to split game static: "+starting_day_of_current_year)
 
-#Filtering registered plays on the 2023 year
-plays2023DF = playsDF.loc[(playsDF['Date'] >= starting_day_of_current_year)]
 
-lastPlays2023DF = plays2023DF[['Id_Game', 'Name', 'Date']].pivot_table(index=['Id_Game', 'Name'], values='Date', aggfunc='max').reset_index()
+    #Close the last shard and list the shards.
+    write_table_of_contents(config, shard_names)
 
-lastPlaysBefore2023DF = playsDF[['Id_Game', 'Name', 'Date']].pivot_table(index=['Id_Game', 'Name'], values='Date', aggfunc='max').reset_index()
-lastPlaysBefore2023DF = lastPlaysBefore2023DF.loc[(lastPlaysBefore2023DF['Date'] < starting_day_of_current_year)]
+    #Write the index.
+    write_index(config)
+    write_index_json(config)
 
-groupedPlaysPerGame2023IntermDF = plays2023DF[['Id_Game', 'Name', 'Id_Play', 'Quantity']].pivot_table(index=['Id_Game', 'Name', 'Id_Play', 'Quantity']).reset_index()
-groupedPlaysPerGame2023DF = groupedPlaysPerGame2023IntermDF[['Id_Game', 'Name', 'Quantity']].pivot_table(index=['Id_Game', 'Name'], values='Quantity', aggfunc='sum').reset_index()
+    #Write the trailer.
+    write_output_trailer(config.output)
 
-groupedPlaysPerGamePerPlayer2023DF = plays2023DF[['Id_Game', 'Name', 'Player_Name', 'Quantity']].pivot_table(index=['Id_Game', 'Name', 'Player_Name'], values='Quantity', aggfunc='sum').reset_index()
-groupedPlaysPerGamePerPlayerDF = playsDF[['Id_Game', 'Name', 'Player_Name', 'Quantity']].pivot_table(index=['Id_Game', 'Name', 'Player_Name'], values='Quantity', aggfunc='sum').reset_index()
+    #If plays is not to be proceed, we end the build here
+    if not (config.plays):
+        return
 
-groupedPlaysPerGameIntermDF = playsDF[['Id_Game', 'Name', 'Id_Play', 'Quantity']].pivot_table(index=['Id_Game', 'Name', 'Id_Play', 'Quantity']).reset_index()
-groupedPlaysPerGameDF = groupedPlaysPerGameIntermDF[['Id_Game', 'Name', 'Quantity']].pivot_table(index=['Id_Game', 'Name'], values='Quantity', aggfunc='sum').reset_index()
+    if(os.path.exists(config.output_xlsx) and not config.no_cache_plays):
+        print("Re-using loaded data for plays")
+    else:
+        playsDF = playsColumns.to_frame()
+    #End of IF    
 
-groupedVictoryPlays2023DF = plays2023DF[['Id_Game', 'Name', 'Player_Name', 'Quantity', 'Victory']].pivot_table(index=['Id_Game', 'Name', 'Player_Name', 'Quantity'], values='Victory', aggfunc='sum').reset_index()
-groupedVictoryPlays2023DF["NB_VictoryInt"] = groupedVictoryPlays2023DF['Quantity']*groupedVictoryPlays2023DF['Victory']
-groupedVictoryPlays2023DF = groupedVictoryPlays2023DF[['Id_Game', 'Name', 'Player_Name', 'NB_VictoryInt']].pivot_table(index=['Id_Game', 'Name', 'Player_Name'], values='NB_VictoryInt', aggfunc='sum').reset_index()
+    #Manage date and year for filter
+    starting_day_of_current_year = datetime.now().date().replace(month=1, day=1)  
+    current_year = str(starting_day_of_current_year.strftime("%Y"))
+    current_year_month = get_month(starting_day_of_current_year)
+    starting_day_of_current_year = str(starting_day_of_current_year.strftime("%Y-%m-%d"))
+    logging.info("Current year for processing games static: "+current_year)
+    logging.info("First day of the current year to split game static: "+starting_day_of_current_year)
 
-groupedVictoryPlaysDF = playsDF[['Id_Game', 'Name', 'Player_Name', 'Quantity', 'Victory']].pivot_table(index=['Id_Game', 'Name', 'Player_Name', 'Quantity'], values='Victory', aggfunc='sum').reset_index()
-groupedVictoryPlaysDF["NB_VictoryInt"] = groupedVictoryPlaysDF['Quantity']*groupedVictoryPlaysDF['Victory']
-groupedVictoryPlaysDF = groupedVictoryPlaysDF[['Id_Game', 'Name', 'Player_Name', 'NB_VictoryInt']].pivot_table(index=['Id_Game', 'Name', 'Player_Name'], values='NB_VictoryInt', aggfunc='sum').reset_index()
+    #Update the monthly rollups with the new plays, every report below is answered from them.
+    rollups = update_plays_rollups(config, playsDF)
+    currentYearReport = plays_window_report(rollups, current_year_month)
+    allYearReport = plays_window_report(rollups)
 
+    lastPlays2023DF = currentYearReport['last_plays']
 
-groupedPlayerDF = playsDF[['Player_Name', 'Victory']].pivot_table(index=['Player_Name'], values='Victory', aggfunc='sum').reset_index()
-groupedPlayerDF = groupedPlayerDF.sort_values(by=['Victory'], ascending=False)
+    lastPlaysBefore2023DF = allYearReport['last_plays']
+    lastPlaysBefore2023DF = lastPlaysBefore2023DF.loc[(lastPlaysBefore2023DF['Date'] < starting_day_of_current_year)]
 
+    groupedPlaysPerGame2023DF = currentYearReport['plays_per_game']
+    groupedPlaysPerGameDF = allYearReport['plays_per_game']
 
- 
-#Saving registered plays data into an Excel file
-write_plays_excelfile(config, current_year, playsDF, lastPlays2023DF, lastPlaysBefore2023DF, groupedPlaysPerGame2023DF, groupedPlaysPerGameDF, groupedVictoryPlays2023DF, groupedVictoryPlaysDF, groupedPlayerDF, groupedPlaysPerGamePerPlayer2023DF)
+    groupedPlaysPerGamePerPlayer2023DF = currentYearReport['plays_per_game_per_player']
 
+    groupedVictoryPlays2023DF = currentYearReport['victory_plays']
+    groupedVictoryPlaysDF = allYearReport['victory_plays']
 
+    groupedPlayerDF = allYearReport['player_victories']
 
-meeplesAssociated = {}
-meeplesAvailable = ["blue","yellow","green","pink","red","orange","black","violet"]
 
-plt.rcParams.update({'font.size': 22})
 
-#Proceed the association of Player with a color
-for index, row in groupedPlayerDF.iterrows():
-    playerName = str(row['Player_Name'])
-    
-    if (playerName not in meeplesAssociated):
-        if (len(meeplesAvailable) >0):
-            meepleColor = meeplesAvailable[0]
-            meeplesAvailable.remove(meepleColor)
-        else:
-            meepleColor = "white"
-            
-        meeplesAssociated[playerName] = meepleColor
-    #EndIf
-#EndFor
+    #Saving registered plays data into an Excel file (and/or CSV, Parquet files), in the background if asked while the plays pages are rendered.
+    export_executor = ThreadPoolExecutor(max_workers=1)
+    export_future = export_executor.submit(write_plays_export, config, current_year, playsDF, lastPlays2023DF, lastPlaysBefore2023DF, groupedPlaysPerGame2023DF, groupedPlaysPerGameDF, groupedVictoryPlays2023DF, groupedVictoryPlaysDF, groupedPlayerDF, groupedPlaysPerGamePerPlayer2023DF)
+    if not (config.export_in_background):
+        export_future.result()
 
 
-#Write the html header and link to the approprate CSS file for the plays.
-write_output_plays_header(config)
 
+    meeplesAssociated = {}
+    meeplesAvailable = ["blue","yellow","green","pink","red","orange","black","violet"]
 
-#Proceed the game plays this year
-lastPlays2023DF = lastPlays2023DF.sort_values(by='Date', ascending=False)
-for index, row in lastPlays2023DF.iterrows():
-    #Read the template.
-    template = open_plays_template(config)
-    
-    gameId = row['Id_Game']
-    
-    #Replace values in the template.
-    if(config.no_cache):
-        template = template.replace('{{image}}'     , game_info.image or "") ####game_info does not exist here bad copy paste
-    else:
-        template = template.replace('{{image}}'     , os.path.join(config.images_path, str(gameId) + ".jpg") or "")
-    
-    
-    template = template.replace('{{GameId}}'      , str(gameId)                            or "")
-    template = template.replace('{{GameName}}'      , row['Name']                            or "N/A")
-    template = template.replace('{{LastPlayed}}'    , row['Date']                                or "N/A")
-    
-    nbPlays2023Row = groupedPlaysPerGame2023DF.loc[groupedPlaysPerGame2023DF['Id_Game'] == gameId]
-    if (len(nbPlays2023Row.index) >=1):
-        nbPlays2023 = str(nbPlays2023Row['Quantity'].values[0])
-    else:
-        nbPlays2023 = "N/A"
-    template = template.replace('{{TP2023}}'        , nbPlays2023                               or "N/A")
-    
-    nbPlaysAllYearRow = groupedPlaysPerGameDF.loc[groupedPlaysPerGameDF['Id_Game'] == gameId]
-    if (len(nbPlaysAllYearRow.index) >=1):
-        nbPlaysAllYear = str(nbPlaysAllYearRow['Quantity'].values[0])
-    else:
-        nbPlaysAllYear = "N/A"
-    template = template.replace('{{TPAll}}'         , nbPlaysAllYear                            or "N/A")
-    
-    
-    groupedVictoryPlaysRows = groupedVictoryPlaysDF.loc[groupedVictoryPlaysDF['Id_Game'] == gameId]
-    nbVictoryRows = groupedVictoryPlaysRows.loc[groupedVictoryPlaysRows['NB_VictoryInt'] > 0]
-    if (len(nbVictoryRows.index) >= 1):
-        groupedVictoryPlaysRows = groupedVictoryPlaysRows[['Player_Name', 'NB_VictoryInt']]
-        pieData = groupedVictoryPlaysRows[['Player_Name', 'NB_VictoryInt']].pivot_table(index=['Player_Name'], values='NB_VictoryInt', aggfunc='sum').reset_index()
-        pieDataSorted = pieData.sort_values(by=['NB_VictoryInt'], ascending=False)
-        pieDataSorted.insert(1, "Color",pieDataSorted['Player_Name'].apply(lambda x: meeplesAssociated[x]))
-        color_list = pieDataSorted['Color']
-        pie = groupedVictoryPlaysRows[['Player_Name', 'NB_VictoryInt']].pivot_table(index=['Player_Name'], values='NB_VictoryInt', aggfunc='sum').sort_values(by=['NB_VictoryInt'], ascending=False).plot(kind="pie", y='NB_VictoryInt', ylabel='', colors=color_list, autopct=lambda p: format(p, '.1f') if p > 5 else None, subplots=True, legend = False)
-        fig = pie[0].get_figure()
-        fig.savefig(os.path.join(config.images_path, str(gameId) + "-result.png"), transparent=True)
-        plt.cla()
-        plt.close(fig)
-        template = template.replace('{{victoryPie}}'     , os.path.join(config.images_path, str(gameId) + "-result.png") or "")
-    else:
-        template = template.replace('{{victoryPie}}'     , os.path.join(config.images_template, "looser-result.png") or "")
-    
-    results = ""
-    victoryPlays2023Rows = groupedVictoryPlays2023DF.loc[groupedVictoryPlays2023DF['Id_Game'] == gameId]
-    for vicIndex, victoryPlays2023Row in victoryPlays2023Rows.iterrows():
-        playerName = str(victoryPlays2023Row['Player_Name'])
-        
-        if (playerName in meeplesAssociated):
-            meepleColor = meeplesAssociated[playerName]
-        else:
-            if (len(meeplesAvailable) >0):
-                meepleColor = meeplesAvailable[0]
-                meeplesAvailable.remove(meepleColor)
-            else:
-                meepleColor = "white"
-            
-            meeplesAssociated[playerName] = meepleColor
-        #EndIf
-        
-        results = results + "<b>"+playerName+"</b>: "
-        victory = victoryPlays2023Row['NB_VictoryInt']
-        groupedPlaysPerPlayerForSelectedGame2023DF = groupedPlaysPerGamePerPlayer2023DF.loc[groupedPlaysPerGamePerPlayer2023DF['Id_Game'] == gameId]
-        nbPlaysRows = groupedPlaysPerPlayerForSelectedGame2023DF.loc[groupedPlaysPerPlayerForSelectedGame2023DF['Player_Name'] == playerName]
-        players_nbPlays2023 = "999"
-        if (len(nbPlaysRows.index) >=1):
-            players_nbPlays2023 = str(nbPlaysRows['Quantity'].values[0])
-        results = results + str(victory) + " / " + players_nbPlays2023 + " - "
-        for x in range(0, victory):
-            results = results + "<img src=\"" + os.path.join(config.images_template, "meeple-" + str(meepleColor) + ".png") + "\" class=\"meeple\"> "
-        results = results + "<br>"
+    #Proceed the association of Player with a color
+    for index, row in groupedPlayerDF.iterrows():
+        get_meeple_color(str(row['Player_Name']))
     #EndFor
-    
-    template = template.replace('{{Results}}'         , results                            or "N/A")
-    
-    #Write to output.html
-    with open(config.output_plays, 'a', encoding="utf-8") as file:
-        file.write(template)
-
-
-
-#Write the trailer.
-write_output_trailer(config.output_plays)
 
 
+    #Write the html header and link to the approprate CSS file for the plays.
+    write_output_plays_header(config)
+
+    #Proceed the game plays this year
+    write_plays_page(config, config.output_plays, open_plays_template(config), lastPlays2023DF.sort_values(by='Date', ascending=False), currentYearReport, allYearReport, "-result")
+
+    #Write the trailer.
+    write_output_trailer(config.output_plays)
+
+
+
+    #Write the html header and link to the approprate CSS file for the plays.
+    write_output_not_play_header(config)
+
+    #Proceed the game not plays this year
+    write_plays_page(config, config.output_not_play, open_not_play_template(config), lastPlaysBefore2023DF.sort_values(by='Date', ascending=False), None, allYearReport, "-np-result")
+
+    #Write the trailer.
+    write_output_trailer(config.output_not_play)
+
+
+
+    #Proceed the recap pages, one per window, same layout as the plays page of the current year.
+    for window in config.recap:
+        label, startMonth, endMonth = parse_recap_window(window)
+        recapReport = plays_window_report(rollups, startMonth, endMonth)
+        output_recap = os.path.splitext(config.output_plays)[0] + "_" + label + ".html"
+        logging.info(f'Writing recap {label} to {output_recap}')
+
+        write_output_plays_header(config, output_recap)
+        write_plays_page(config, output_recap, open_plays_template(config), recapReport['last_plays'].sort_values(by='Date', ascending=False), recapReport, allYearReport, "-" + label + "-result")
+        write_output_trailer(output_recap)
+
+
+
+    #Wait for the plays export.
+    export_future.result()
+    export_executor.shutdown()
+    close_download_journal(config)
+
+def get_user_config(config, user_name):
+    #Same options as the service, with the files of the user in their own directory and empty indexes.
+    user_dir = os.path.join(config.serve_path, user_name)
+    os.makedirs(user_dir, exist_ok=True)
+
+    user_config = copy.copy(config)
+    user_config.user_name           = user_name
+    user_config.output              = os.path.join(user_dir, "output.html")
+    user_config.output_plays        = os.path.join(user_dir, "output_plays.html")
+    user_config.output_not_play     = os.path.join(user_dir, "output_not_play.html")
+    user_config.output_expansions   = os.path.join(user_dir, "output_expansions.html")
+    user_config.output_xlsx         = os.path.join(user_dir, "Plays.xlsx")
+    user_config.rollups_file        = os.path.join(user_dir, "Plays_rollups.pkl")
+    user_config.journal             = os.path.join(user_dir, "download_journal.jsonl")
+    user_config.journal_plays       = None
+    user_config.collection_xml      = os.path.join(user_dir, "collection.xml")
+    user_config.expansions_xml      = os.path.join(user_dir, "collection_expansions.xml")
+    user_config.index_json          = os.path.join(user_dir, "index.json") if len(config.index_json) > 0 else ""
+    user_config.dict_index          = {section: {} for section in index_titles}
+    user_config.dict_index_games    = {}
+    user_config.dict_game_info      = {}
+    user_config.shard_outputs       = []
+    return user_config
+
+class catalog_service:
+    #Pages of each user are kept in memory. Requests for a user being built wait for that build instead of starting another one,
+    #and pages older than config.refresh are served while the user is rebuilt in the background. The least recently requested users
+    #are evicted past config.cache_users, their next request builds them again from their cached files.
+    pages_files = {'catalog': 'output', 'plays': 'output_plays', 'not_played': 'output_not_play', 'expansions': 'output_expansions'}
+
+    def __init__(self, config):
+        self.config     = config
+        self.lock       = threading.Lock()
+        #build() works on module globals (plays columns, meeples), so builds run one at a time.
+        self.builder    = ThreadPoolExecutor(max_workers=1)
+        self.builds     = {}
+        self.pages      = memory_cache(config.cache_users)
+
+    def get_pages(self, user_name):
+        with self.lock:
+            built = self.pages.get(user_name)
+            if(built is not None):
+                if((datetime.now() - built[0]).total_seconds() > self.config.refresh and user_name not in self.builds):
+                    logging.info(f'Refreshing {user_name} in the background')
+                    self.builds[user_name] = self.builder.submit(self.run_build, user_name, True)
+                return built[1]
+            if(user_name not in self.builds):
+                self.builds[user_name] = self.builder.submit(self.run_build, user_name, False)
+            build_future = self.builds[user_name]
+        return build_future.result()
+
+    def run_build(self, user_name, refresh):
+        try:
+            user_config = get_user_config(self.config, user_name)
+            if(refresh):
+                #Collection and plays are requested again, the game XML and images caches are kept.
+                for f in (user_config.collection_xml, user_config.expansions_xml):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(f)
+                user_config.no_cache_plays = True
+
+            buildstart = datetime.now()
+            failure = None
+            try:
+                build(user_config)
+            except SystemExit:
+                failure = RuntimeError(f'Build failed for {user_name}')
+            except Exception as e:
+                failure = e
+            if(failure is not None):
+                if not (refresh):
+                    raise failure
+                #The failure is logged and the current pages are kept until the next refresh. When they were evicted meanwhile,
+                #a request may be waiting on this refresh and gets the failure.
+                logging.error(f'Refreshing {user_name} failed', exc_info=failure)
+                built = self.pages.get(user_name)
+                if(built is None):
+                    raise failure
+                self.pages.put(user_name, (datetime.now(), built[1]))
+                return built[1]
+            logging.info(f'Built {user_name} in {datetime.now() - buildstart}')
+
+            pages = {}
+            for page, attribute in self.pages_files.items():
+                path = getattr(user_config, attribute)
+                if(os.path.exists(path)):
+                    with open(path, 'rb') as file:
+                        pages[page] = file.read()
+            self.pages.put(user_name, (datetime.now(), pages))
+            return pages
+        finally:
+            with self.lock:
+                self.builds.pop(user_name, None)
+
+class catalog_request_handler(BaseHTTPRequestHandler):
+    #/<page>?username=USER answers a page, other paths are the stylesheets and images the pages link to.
+    service = None
+    static_styles = ('style.css', 'style_card.css', 'style_plays.css')
+
+    def get_static_file(self, url_path):
+        #Allow-list of what the pages link to: the stylesheets and the files right in the two image directories. Anything else,
+        #the files of the users included, is not served.
+        folder, name = posixpath.split(posixpath.normpath(unquote(url_path)).lstrip('/'))
+        if(name in ('', '.', '..') or name.startswith('.') or '\0' in name):
+            return None
+        if(folder == '' and name in self.static_styles):
+            return name
+        for directory in (self.service.config.images_path, self.service.config.images_template):
+            if(folder == os.path.basename(os.path.normpath(directory))):
+                return os.path.join(directory, name)
+        return None
 
-#Write the html header and link to the approprate CSS file for the plays.
-write_output_not_play_header(config)
+    def send_static_file(self, path):
+        if(path is None or not os.path.isfile(path)):
+            return self.send_error(404)
+        with open(path, 'rb') as file:
+            content = file.read()
+        self.send_response(200)
+        self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        page = url.path.strip('/')
+        if(page not in catalog_service.pages_files):
+            return self.send_static_file(self.get_static_file(url.path))
+
+        user_name = parse_qs(url.query).get('username', [''])[0]
+        #The user name is part of a path, only BGG user name characters are accepted.
+        if not (re.fullmatch(r'[A-Za-z0-9_ .-]+', user_name) and user_name.strip('.')):
+            return self.send_error(400, 'Invalid username')
+
+        try:
+            pages = self.service.get_pages(user_name)
+        except Exception:
+            #The detail stays in the log, it may hold paths or BGG answers.
+            logging.exception(f'No pages for {user_name}')
+            return self.send_error(500, 'Build failed')
+        if(page not in pages):
+            return self.send_error(404)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(pages[page])))
+        self.end_headers()
+        self.wfile.write(pages[page])
+
+def serve(config):
+    os.makedirs(config.serve_path, exist_ok=True)
+    catalog_request_handler.service = catalog_service(config)
+    server = ThreadingHTTPServer(('', config.port), catalog_request_handler)
+    logging.info(f'Serving on port {config.port}')
+    with contextlib.suppress(KeyboardInterrupt):
+        server.serve_forever()
 
-#Proceed the game not plays this year
-lastPlaysBefore2023OrderedDF = lastPlaysBefore2023DF.sort_values(by='Date', ascending=False)
-for index, row in lastPlaysBefore2023OrderedDF.iterrows():
-    #Read the template.
-    template = open_not_play_template(config)
-    
-    gameId = row['Id_Game']
-    
-    #Replace values in the template.
-    if(config.no_cache):
-        template = template.replace('{{image}}'     , game_info.image or "") ####game_info does not exist here bad copy paste
-    else:
-        template = template.replace('{{image}}'     , os.path.join(config.images_path, str(gameId) + ".jpg") or "")
-    
-    
-    template = template.replace('{{GameId}}'      , str(gameId)                            or "")
-    template = template.replace('{{GameName}}'      , row['Name']                            or "N/A")
-    template = template.replace('{{LastPlayed}}'    , row['Date']                                or "N/A")
-    template = template.replace('{{TP2023}}'        , "N/A")
-    
-    
-    nbPlaysAllYearRow = groupedPlaysPerGameDF.loc[groupedPlaysPerGameDF['Id_Game'] == gameId]
-    if (len(nbPlaysAllYearRow.index) >=1):
-        nbPlaysAllYear = str(nbPlaysAllYearRow['Quantity'].values[0])
-    else:
-        nbPlaysAllYear = "N/A"
-    template = template.replace('{{TPAll}}'         , nbPlaysAllYear                            or "N/A")
-    
-    
-    groupedVictoryPlaysRows = groupedVictoryPlaysDF.loc[groupedVictoryPlaysDF['Id_Game'] == gameId]
-    nbVictoryRows = groupedVictoryPlaysRows.loc[groupedVictoryPlaysRows['NB_VictoryInt'] > 0]
-    if (len(nbVictoryRows.index) >= 1):
-        groupedVictoryPlaysRows = groupedVictoryPlaysRows[['Player_Name', 'NB_VictoryInt']]
-        pieData = groupedVictoryPlaysRows[['Player_Name', 'NB_VictoryInt']].pivot_table(index=['Player_Name'], values='NB_VictoryInt', aggfunc='sum').reset_index()
-        pieDataSorted = pieData.sort_values(by=['NB_VictoryInt'], ascending=False)
-        pieDataSorted.insert(1, "Color",pieDataSorted['Player_Name'].apply(lambda x: meeplesAssociated[x]))
-        color_list = pieDataSorted['Color']
-        pie = groupedVictoryPlaysRows[['Player_Name', 'NB_VictoryInt']].pivot_table(index=['Player_Name'], values='NB_VictoryInt', aggfunc='sum').sort_values(by=['NB_VictoryInt'], ascending=False).plot(kind="pie", y='NB_VictoryInt', ylabel='', colors=color_list, autopct=lambda p: format(p, '.1f') if p > 5 else None, subplots=True, legend = False)
-        fig = pie[0].get_figure()
-        fig.savefig(os.path.join(config.images_path, str(gameId) + "-np-result.png"), transparent=True)
-        plt.cla()
-        plt.close(fig)
-        template = template.replace('{{victoryPie}}'     , os.path.join(config.images_path, str(gameId) + "-np-result.png") or "")
-    else:
-        template = template.replace('{{victoryPie}}'     , os.path.join(config.images_template, "looser-result.png") or "")
-    
-    
-    results = ""
-    victoryPlaysRows = groupedVictoryPlaysDF.loc[groupedVictoryPlaysDF['Id_Game'] == gameId]
-    for vicIndex, victoryPlaysRow in victoryPlaysRows.iterrows():
-        playerName = str(victoryPlaysRow['Player_Name'])
-        
-        if (playerName in meeplesAssociated):
-            meepleColor = meeplesAssociated[playerName]
-        else:
-            if (len(meeplesAvailable) >0):
-                meepleColor = meeplesAvailable[0]
-                meeplesAvailable.remove(meepleColor)
-            else:
-                meepleColor = "white"
-            
-            meeplesAssociated[playerName] = meepleColor
-        #EndIf
-        
-        results = results + "<b>"+playerName+"</b>: "
-        victory = victoryPlaysRow['NB_VictoryInt']
-        groupedPlaysPerPlayerForSelectedGameDF = groupedPlaysPerGamePerPlayerDF.loc[groupedPlaysPerGamePerPlayerDF['Id_Game'] == gameId]
-        nbPlaysRows = groupedPlaysPerPlayerForSelectedGameDF.loc[groupedPlaysPerPlayerForSelectedGameDF['Player_Name'] == playerName]
-        players_nbPlays = "999"
-        if (len(nbPlaysRows.index) >=1):
-            players_nbPlays = str(nbPlaysRows['Quantity'].values[0])
-        results = results + str(victory) + " / " + players_nbPlays + " - "
-        for x in range(0, victory):
-            results = results + "<img src=\"" + os.path.join(config.images_template, "meeple-" + str(meepleColor) + ".png") + "\" class=\"meeple\"> "
-        results = results + "<br>"
-    #EndFor
-    
-    template = template.replace('{{Results}}'         , results                            or "N/A")
-    
-    #Write to output.html
-    with open(config.output_not_play, 'a', encoding="utf-8") as file:
-        file.write(template)
+######### End Functions #########
 
+#Get arguments.
+args = parse_arguments()
 
+#Create config.
+config = config(args)
 
-#Write the trailer.
-write_output_trailer(config.output_not_play)
+#Set loging level.
+logging.basicConfig(level=config.LOGLEVEL)
 
+#Cleanup if args set.
+clean_up(config)
 
+if(config.serve):
+    serve(config)
+else:
+    build(config)
 
 endtime = datetime.now()
 totaltime = endtime - starttime